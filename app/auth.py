@@ -1,60 +1,191 @@
+import asyncio
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
 import os
 from dotenv import load_dotenv
-from . import database, crud
+from . import database, crud, crud_async, models, schemas, cache, hashing, tokens
 
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+SECRET_KEY = tokens.SECRET_KEY
+ALGORITHM = tokens.ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = tokens.ACCESS_TOKEN_EXPIRE_MINUTES
+ADMIN_EMAILS = {email.strip() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 60))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = hashing.pwd_context
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+# Кеш автентифікованих користувачів: "<sub>:<jti>" -> знімок колонок users
+principal_cache = cache.make_cache("principal", PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL, grouped=True)
+_SNAPSHOT_COLUMNS = ("id", "email", "full_name", "last_login", "last_logout", "token_version")
+
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing.verify_password(plain_password, hashed_password)
+
+
+def verify_and_update_password(plain_password, hashed_password):
+    """Перевірка пароля; другим значенням — новий хеш, якщо змінилась вартість bcrypt"""
+    return hashing.verify_and_update(plain_password, hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return tokens.issue(data, (expires_delta or timedelta(minutes=15)).total_seconds())
+
+
+def token_claims(user: models.User) -> dict:
+    """Claims токена входу: email, числовий id і версія токенів користувача"""
+    return {"sub": user.email, "uid": user.id, "ver": user.token_version or 0}
 
 
 def decode_access_token(token: str):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
+        return tokens.verify(token)
+    except tokens.TokenError:
         return None
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    credentials_exception = HTTPException(
+def _principal_key(payload: dict) -> str:
+    return f"{payload['sub']}:{payload.get('jti') or payload.get('iat', '')}"
+
+
+def _snapshot(user: models.User) -> dict:
+    """Знімок користувача для кешу (без хешу пароля)"""
+    data = {}
+    for column in _SNAPSHOT_COLUMNS:
+        value = getattr(user, column)
+        data[column] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def _detached_from_snapshot(data: dict) -> models.User:
+    values = dict(data)
+    for column in ("last_login", "last_logout"):
+        if values[column] is not None:
+            values[column] = datetime.fromisoformat(values[column])
+    user = models.User(**values)
+    make_transient_to_detached(user)  # Решта колонок (password) довантажиться лише за потреби
+    return user
+
+
+def _user_from_snapshot(db: Session, data: dict) -> models.User:
+    """Відновлення користувача з кешу і прив'язка до сесії без SELECT"""
+    return db.merge(_detached_from_snapshot(data), load=False)
+
+
+def invalidate_principal(email: str):
+    """Скидання кешу для всіх токенів користувача (оновлення, видалення, вихід)"""
+    principal_cache.delete_prefix(f"{email}:")
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def _token_payload(token: str) -> dict:
+    """Перевірка JWT; 401, якщо токен недійсний, відкликаний або без sub"""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = crud.get_user_by_email(db, email)
+        payload = tokens.verify(token)
+    except tokens.TokenError:
+        raise _credentials_exception()
+    if payload.get("sub") is None:
+        raise _credentials_exception()
+    return payload
+
+
+def _check_version(payload: dict, token_version):
+    """Токен, виданий до зміни пароля, недійсний (порівняння "ver" з users.token_version)"""
+    if "ver" in payload and token_version is not None and payload["ver"] != token_version:
+        raise _credentials_exception()
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+    payload = _token_payload(token)
+
+    key = _principal_key(payload)
+    cached = principal_cache.get(key)
+    if cached is not None:
+        _check_version(payload, cached.get("token_version"))
+        return _user_from_snapshot(db, cached)
+
+    user = crud.get_user_by_email(db, payload["sub"])
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    _check_version(payload, user.token_version)
 
+    principal_cache.set(key, _snapshot(user))
     return user
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme),
+                                 db: AsyncSession = Depends(database.get_async_db)):
+    """get_current_user для async-режиму (AsyncSession); Redis-виклики — у пулі потоків"""
+    payload = await asyncio.to_thread(_token_payload, token)
+
+    key = _principal_key(payload)
+    cached = await asyncio.to_thread(principal_cache.get, key)
+    if cached is not None:
+        _check_version(payload, cached.get("token_version"))
+        return await db.merge(_detached_from_snapshot(cached), load=False)
+
+    user = await crud_async.get_user_by_email(db, payload["sub"])
+    if user is None:
+        raise _credentials_exception()
+    _check_version(payload, user.token_version)
+
+    await asyncio.to_thread(principal_cache.set, key, _snapshot(user))
+    return user
+
+
+def _legacy_user_id(payload: dict) -> int:
+    """id для токенів без claim "uid" (видані раніше): з кешу principal або з БД"""
+    cached = principal_cache.get(_principal_key(payload))
+    if cached is not None:
+        return cached["id"]
+    db = database.open_session()
+    try:
+        user = crud.get_user_by_email(db, payload["sub"])
+    finally:
+        db.close()
+    if user is None:
+        raise _credentials_exception()
+    return user.id
+
+
+def get_current_identity(token: str = Depends(oauth2_scheme)) -> schemas.TokenData:
+    """Ідентичність з claims токена без звернення до БД — для маршрутів, яким потрібен лише id.
+    Звичайна def: перевірка відкликання (Redis) виконується в пулі потоків, а не в циклі подій"""
+    payload = _token_payload(token)
+    user_id = payload.get("uid")
+    if user_id is None:
+        user_id = _legacy_user_id(payload)
+    return schemas.TokenData.model_construct(
+        email=payload["sub"], id=user_id, token_version=payload.get("ver", 0),
+        jti=payload.get("jti"), exp=payload.get("exp"),
+    )
+
+
+def revoke_token(identity: schemas.TokenData):
+    """Відкликати поточний токен (вихід)"""
+    tokens.revoke(identity.jti, identity.exp)
+
+
+# Залежність поточного користувача відповідно до режиму БД
+current_user_dependency = get_current_user_async if database.DB_MODE == "async" else get_current_user
+
+
+def require_admin(current_user: models.User = Depends(current_user_dependency)):
+    """Доступ лише для адміністраторів (ADMIN_EMAILS), напр. до масового імпорту"""
+    if current_user.email not in ADMIN_EMAILS:
+        raise HTTPException(status_code=403, detail="Недостатньо прав")
+    return current_user
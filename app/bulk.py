@@ -0,0 +1,299 @@
+"""Масовий імпорт / експорт користувачів і постів (NDJSON або CSV)"""
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+
+from dotenv import load_dotenv
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from . import database, feed, models, schemas, hashing, search, response_cache
+
+load_dotenv()
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))  # Рядків на один INSERT і транзакцію
+MAX_REPORTED_ERRORS = 100
+STREAM_QUEUE_BATCHES = 16  # Шматків тіла запиту в черзі до потоку імпорту
+FORMATS = ("ndjson", "csv")
+
+USER_EXPORT_COLUMNS = ("id", "email", "full_name", "last_login", "last_logout")
+POST_EXPORT_COLUMNS = ("id", "user_id", "text", "created_at", "updated_at")
+
+
+class ImportReport:
+    """Підсумок імпорту: скільки вставлено, скільки відхилено і чому"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors = []
+
+    def error(self, line: int, message: str):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {"inserted": self.inserted, "failed": self.failed, "chunks": self.chunks,
+                "errors": self.errors, "errors_truncated": self.failed > len(self.errors)}
+
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"Непідтримуваний формат: {fmt}")
+
+
+def parse_records(lines, fmt: str):
+    """(номер рядка, запис, помилка) для кожного запису; порожні рядки і заголовок CSV пропускаються.
+
+    CSV читається одним csv.reader по всьому потоку рядків (з символами кінця рядка),
+    тож поля в лапках з переносами рядків — як у /export — розбираються коректно.
+    """
+    _check_format(fmt)
+    if fmt == "ndjson":
+        for line_no, line in enumerate(lines, start=1):
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, None, f"Некоректний JSON: {e}"
+                continue
+            if not isinstance(record, dict):
+                yield line_no, None, "Очікується JSON-об'єкт"
+                continue
+            yield line_no, record, None
+        return
+
+    reader = csv.reader(lines)
+    header = None
+    start = 1  # Перший фізичний рядок поточного запису
+    while True:
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield start, None, f"Некоректний CSV: {e}"
+            start = reader.line_num + 1
+            continue
+        line_no, start = start, reader.line_num + 1
+        if not values or (len(values) == 1 and not values[0].strip()):
+            continue
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield line_no, None, f"Очікується {len(header)} колонок, отримано {len(values)}"
+            continue
+        yield line_no, {k: (v if v != "" else None) for k, v in zip(header, values)}, None
+
+
+def _validate(chunk, schema, report):
+    valid = []
+    for line, record, error in chunk:
+        if error:
+            report.error(line, error)
+            continue
+        try:
+            valid.append((line, schema.model_validate(record)))
+        except ValidationError as e:
+            report.error(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+    return valid
+
+
+def _insert(table, lines, rows, report):
+    """Один INSERT ... VALUES (...), (...) в окремій транзакції"""
+    if not rows:
+        return
+    try:
+        with database.get_engine().begin() as connection:
+            connection.execute(insert(table).values(rows))
+    except SQLAlchemyError as e:
+        message = f"Порцію не записано: {e.__class__.__name__}: {getattr(e, 'orig', e)}"
+        for line in lines:
+            report.error(line, message)
+        return
+    report.inserted += len(rows)
+
+
+def import_users_chunk(chunk, report: ImportReport):
+    report.chunks += 1
+    valid = _validate(chunk, schemas.UserImport, report)
+
+    users = models.User.__table__
+    emails = [user.email for _, user in valid]
+    with database.get_engine().connect() as connection:
+        existing = set(connection.scalars(select(users.c.email).where(users.c.email.in_(emails))))
+
+    accepted, seen = [], set()
+    for line, user in valid:
+        if user.email in existing or user.email in seen:
+            report.error(line, f"Email вже зареєстрований: {user.email}")
+            continue
+        seen.add(user.email)
+        accepted.append((line, user))
+
+    # Паролі відкритим текстом хешуються паралельно в пулі хешування
+    plain = [user.password for _, user in accepted if not user.password_hash]
+    hashes = iter(hashing.hash_many(plain))
+    rows = [{"email": user.email, "full_name": user.full_name,
+             "password": user.password_hash or next(hashes)} for _, user in accepted]
+    _insert(users, [line for line, _ in accepted], rows, report)
+
+
+def import_posts_chunk(chunk, report: ImportReport):
+    report.chunks += 1
+    valid = _validate(chunk, schemas.PostImport, report)
+
+    users = models.User.__table__
+    user_ids = {post.user_id for _, post in valid}
+    with database.get_engine().connect() as connection:
+        existing = set(connection.scalars(select(users.c.id).where(users.c.id.in_(user_ids))))
+
+    accepted = []
+    for line, post in valid:
+        if post.user_id not in existing:
+            report.error(line, f"Користувача {post.user_id} не існує")
+            continue
+        accepted.append((line, post))
+
+    now = datetime.utcnow()
+    rows = [{"user_id": post.user_id, "text": post.text,
+             "created_at": post.created_at or now,
+             "updated_at": post.updated_at or post.created_at or now} for _, post in accepted]
+    inserted = report.inserted
+    _insert(models.Post.__table__, [line for line, _ in accepted], rows, report)
+    if report.inserted == inserted:
+        return  # Порцію не записано — кеші актуальні
+    # Після коміту порції: сторінки постів авторів і стрічки їхніх підписників
+    authors = {post.user_id for _, post in accepted}
+    for user_id in authors:
+        response_cache.invalidate_user(user_id)
+    with database.get_engine().connect() as connection:
+        feed.invalidate_followers(connection, authors)
+
+
+IMPORTERS = {"users": import_users_chunk, "posts": import_posts_chunk}
+
+
+def finish_import(kind: str, report: ImportReport):
+    if kind == "users" and report.inserted:
+        search.ngram_index.reset()  # Внутрішній пошуковий індекс перечитається з БД
+    return report.as_dict()
+
+
+def import_lines(kind: str, lines, fmt: str) -> dict:
+    """Синхронний імпорт з ітератора рядків (CLI; також потік тіла запиту в import_stream)"""
+    _check_format(fmt)
+    importer, report = IMPORTERS[kind], ImportReport()
+    chunk = []
+    for item in parse_records(lines, fmt):
+        chunk.append(item)
+        if len(chunk) >= BULK_CHUNK_SIZE:
+            importer(chunk, report)
+            chunk = []
+    if chunk:
+        importer(chunk, report)
+    return finish_import(kind, report)
+
+
+async def _aiter_line_batches(byte_chunks):
+    """Рядки разом із символом кінця рядка з потоку байтів тіла запиту (UTF-8),
+    списком на кожен отриманий шматок"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for data in byte_chunks:
+        pending += decoder.decode(data)
+        *lines, pending = pending.split("\n")
+        if lines:
+            yield [line + "\n" for line in lines]
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield [pending]
+
+
+async def import_stream(kind: str, byte_chunks, fmt: str) -> dict:
+    """Потоковий імпорт з тіла HTTP-запиту.
+
+    Розбір і запис виконуються import_lines в окремому потоці, який читає рядки з обмеженої
+    черги (без накопичення всього тіла); один csv.reader бачить увесь потік.
+    """
+    _check_format(fmt)
+    batches = queue.Queue(maxsize=STREAM_QUEUE_BATCHES)
+    finished = threading.Event()
+
+    def lines():
+        try:
+            while (batch := batches.get()) is not None:
+                yield from batch
+        finally:
+            finished.set()
+
+    def put(batch):
+        # Якщо імпорт завершився з помилкою, черга більше не читається — не чекаємо вічно
+        while not finished.is_set():
+            try:
+                batches.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run():
+        try:
+            return import_lines(kind, lines(), fmt)
+        finally:
+            finished.set()
+
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    try:
+        async for batch in _aiter_line_batches(byte_chunks):
+            await asyncio.to_thread(put, batch)
+    finally:
+        await asyncio.to_thread(put, None)
+        report = await worker
+    return report
+
+
+def _format_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_lines(kind: str, fmt: str, user_id: int = None):
+    """Генератор рядків експорту; читання серверним курсором порціями BULK_CHUNK_SIZE"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Непідтримуваний формат: {fmt}")
+    if kind == "users":
+        table, columns = models.User.__table__, USER_EXPORT_COLUMNS
+    else:
+        table, columns = models.Post.__table__, POST_EXPORT_COLUMNS
+    statement = select(*(table.c[name] for name in columns)).order_by(table.c.id)
+    if kind == "posts" and user_id is not None:
+        statement = statement.where(table.c.user_id == user_id)
+
+    with database.get_engine().connect() as connection:
+        result = connection.execution_options(stream_results=True, yield_per=BULK_CHUNK_SIZE).execute(statement)
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator="\n")
+            writer.writerow(columns)
+            for row in result:
+                writer.writerow([_format_value(value) for value in row])
+                if buffer.tell() > 65536:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for row in result:
+                record = {name: _format_value(value) for name, value in zip(columns, row)}
+                yield json.dumps(record, ensure_ascii=False) + "\n"
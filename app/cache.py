@@ -0,0 +1,338 @@
+import fnmatch
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory | redis | fakeredis
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Усі створені кеші (ім'я -> кеш), щоб віддавати їхню статистику
+caches = {}
+
+CURRENT = object()  # set() без generation: записати з поточним поколінням групи
+
+
+class MemoryCache:
+    """Обмежений LRU-кеш з TTL у пам'яті процесу.
+
+    maxsize=None — без витіснення за розміром: записи зникають лише після TTL
+    (прострочені прибираються, коли кількість записів подвоюється).
+    grouped=True — як у RedisCache: delete_prefix("<група>:") змінює покоління групи,
+    і set(..., generation=...) не запише значення, прочитане до скидання.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 60, grouped: bool = False):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.grouped = grouped
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._sweep_at = 1024  # Розмір, при якому прибрати прострочені (maxsize=None)
+        # Покоління груп: номер з монотонного лічильника; для витіснених груп — не менше _floor
+        self._generations = OrderedDict()
+        self._counter = 0
+        self._floor = 0
+
+    def _generation(self, key: str) -> int:
+        return self._generations.get(key.split(":", 1)[0], self._floor)
+
+    def get_with_generation(self, key: str):
+        """(значення | None, покоління групи) — покоління передається в set після запиту до БД"""
+        with self._lock:
+            generation = self._generation(key)
+        return self.get(key), generation
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value, ttl: float = None, generation=CURRENT):
+        expires_at = time.monotonic() + (ttl or self.ttl)
+        with self._lock:
+            if generation is not CURRENT and generation != self._generation(key):
+                return  # Групу скинули, поки значення обчислювалось
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            if self.maxsize is None:
+                if len(self._data) >= self._sweep_at:
+                    now = time.monotonic()
+                    for stale in [k for k, (expires, _) in self._data.items() if expires < now]:
+                        del self._data[stale]
+                    self._sweep_at = max(1024, len(self._data) * 2)
+                return
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def delete_prefix(self, prefix: str):
+        with self._lock:
+            if self.grouped and prefix.endswith(":") and prefix.count(":") == 1:
+                self._counter += 1
+                self._generations[prefix[:-1]] = self._counter
+                self._generations.move_to_end(prefix[:-1])
+                while len(self._generations) > (self.maxsize or 100000):
+                    _, dropped = self._generations.popitem(last=False)
+                    self._floor = max(self._floor, dropped)
+            for key in [k for k in self._data if k.startswith(prefix)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+
+class RedisCache:
+    """Спільний кеш поверх Redis-сумісного клієнта (get/set/delete/mget/scan_iter).
+
+    Значення зберігаються як JSON, тому мають бути серіалізовними.
+
+    grouped=True — ключі мають вигляд "<група>:<решта>", і delete_prefix("<група>:")
+    не сканує keyspace, а змінює мітку покоління групи: значення зберігаються разом
+    з міткою, актуальною при записі, і з іншою міткою вважаються промахом.
+    """
+
+    def __init__(self, client, namespace: str, ttl: float = 60, grouped: bool = False):
+        self.client = client
+        self.namespace = namespace
+        self.ttl = ttl
+        self.grouped = grouped
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _generation_key(self, key: str) -> str:
+        return f"{self.namespace}:gen:{key.split(':', 1)[0]}"
+
+    def get_with_generation(self, key: str):
+        """(значення | None, мітка покоління групи) — мітка передається в set після запиту до БД"""
+        if not self.grouped:
+            return self.get(key), None
+        # Значення і мітка покоління групи — одним MGET
+        raw, generation = self.client.mget(self._key(key), self._generation_key(key))
+        generation = _decode(generation)
+        value = None
+        if raw is not None:
+            stored_generation, value = json.loads(raw)
+            if stored_generation != generation:
+                raw = None
+        if raw is None:
+            self.misses += 1
+            return None, generation
+        self.hits += 1
+        return value, generation
+
+    def get(self, key: str):
+        if self.grouped:
+            return self.get_with_generation(key)[0]
+        raw = self.client.get(self._key(key))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value, ttl: float = None, generation=CURRENT):
+        """generation — мітка з get_with_generation, прочитана до запиту до БД: якщо групу
+        відтоді скинули, значення з цією міткою читатиметься як промах"""
+        if self.grouped:
+            if generation is CURRENT:
+                generation = _decode(self.client.get(self._generation_key(key)))
+            value = [generation, value]
+        self.client.set(self._key(key), json.dumps(value), ex=max(1, int(ttl or self.ttl)))
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+    def delete_many(self, keys):
+        names = [self._key(key) for key in keys]
+        if names:
+            self.client.delete(*names)  # Одна команда DEL
+
+    def delete_prefix(self, prefix: str):
+        if self.grouped and prefix.endswith(":") and prefix.count(":") == 1:
+            # Нова мітка живе не менше за значення, записані з попередньою
+            self.client.set(self._generation_key(prefix), secrets.token_hex(8), ex=max(1, int(self.ttl)))
+            return
+        keys = list(self.client.scan_iter(match=self._key(prefix) + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def clear(self):
+        self.delete_prefix("")
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+def _decode(raw):
+    return raw.decode() if isinstance(raw, bytes) else raw
+
+
+class FakeRedis:
+    """Мінімальна заміна Redis у пам'яті для локальних запусків і тестів (лише потрібні команди)"""
+
+    def __init__(self):
+        self._data = {}  # key -> (expires_at | None, value)
+        self._lock = threading.RLock()  # Реентерабельний: pipeline виконує команди під ним
+
+    def get(self, name):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None:
+                return None
+            if item[0] is not None and item[0] < time.monotonic():
+                del self._data[name]
+                return None
+            return item[1]
+
+    def set(self, name, value, ex=None):
+        with self._lock:
+            self._data[name] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    def mget(self, *names):
+        with self._lock:
+            return [self.get(name) for name in names]
+
+    def delete(self, *names):
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None or (item[0] is not None and item[0] < time.monotonic()):
+                item = (None, 0)
+            value = int(item[1]) + amount
+            self._data[name] = (item[0], value)
+            return value
+
+    def expire(self, name, seconds, nx=False):
+        with self._lock:
+            item = self._data.get(name)
+            if item is None or (nx and item[0] is not None):
+                return False
+            self._data[name] = (time.monotonic() + seconds, item[1])
+            return True
+
+    def zadd(self, name, mapping):
+        with self._lock:
+            members = self.get(name)
+            if members is None:
+                members = {}
+                self._data[name] = (None, members)
+            added = sum(member not in members for member in mapping)
+            members.update(mapping)
+            return added
+
+    def _zsorted(self, name):
+        members = self.get(name) or {}
+        return sorted(members, key=lambda member: (members[member], member))
+
+    def zremrangebyrank(self, name, start, end):
+        with self._lock:
+            ordered = self._zsorted(name)
+            end = len(ordered) + end if end < 0 else end
+            removed = ordered[max(0, len(ordered) + start if start < 0 else start):end + 1]
+            for member in removed:
+                del self._data[name][1][member]
+            return len(removed)
+
+    def zrevrange(self, name, start, end):
+        with self._lock:
+            ordered = self._zsorted(name)[::-1]
+            end = len(ordered) + end if end < 0 else end
+            return ordered[start:end + 1]
+
+    def pipeline(self, transaction=True):
+        return _FakePipeline(self)
+
+    def scan_iter(self, match="*"):
+        with self._lock:
+            keys = list(self._data)
+        return (key for key in keys if fnmatch.fnmatchcase(key, match))
+
+
+class _FakePipeline:
+    """Черга команд FakeRedis, що виконується атомарно (аналог MULTI / EXEC)"""
+
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self._commands.append((getattr(self._client, name), args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._client._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+
+_redis_client = None
+
+
+def get_redis_client():
+    """Клієнт спільного сховища згідно з CACHE_BACKEND (створюється один раз)"""
+    global _redis_client
+    if _redis_client is None:
+        if CACHE_BACKEND == "fakeredis":
+            _redis_client = FakeRedis()
+        else:
+            import redis  # Необов'язкова залежність, потрібна лише для CACHE_BACKEND=redis
+            _redis_client = redis.Redis.from_url(REDIS_URL)
+    return _redis_client
+
+
+def make_cache(name: str, maxsize: int, ttl: float, local: bool = False, grouped: bool = False):
+    """Створення кешу з налаштованим бекендом і реєстрація його у статистиці.
+
+    local=True — завжди в пам'яті процесу (дані, які не потрібно ділити між воркерами).
+    grouped=True — ключі "<група>:<решта>", які скидаються групою через delete_prefix.
+    maxsize=None — записи не витісняються за розміром (стан, втрата якого небезпечна).
+    """
+    if CACHE_BACKEND == "memory" or local:
+        cache = MemoryCache(maxsize=maxsize, ttl=ttl, grouped=grouped)
+    else:
+        cache = RedisCache(get_redis_client(), namespace=name, ttl=ttl, grouped=grouped)
+    caches[name] = cache
+    return cache
+
+
+def stats():
+    return {name: cache.stats() for name, cache in caches.items()}
@@ -0,0 +1,67 @@
+"""Командний рядок для міграцій і масового імпорту / експорту.
+
+    python -m app.cli migrate
+    python -m app.cli import-users users.ndjson
+    python -m app.cli import-posts posts.csv --format csv
+    python -m app.cli export-posts --user-id 42 --output posts.ndjson
+
+Схему змінює лише migrate; імпорт і експорт працюють з уже оновленою БД.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import sys
+
+from . import bulk, database, hashing, schema
+
+
+def _format(args, path: str = None) -> str:
+    if args.format:
+        return args.format
+    return "csv" if path and path.endswith(".csv") else "ndjson"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="Масовий імпорт / експорт")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="Дочекатися БД і застосувати міграції (одноразовий крок перед сервером)")
+    for kind in ("users", "posts"):
+        command = commands.add_parser(f"import-{kind}", help=f"Імпорт {kind} з файлу ('-' — stdin)")
+        command.add_argument("path")
+        command.add_argument("--format", choices=bulk.FORMATS)
+        command.set_defaults(action="import", kind=kind)
+
+        command = commands.add_parser(f"export-{kind}", help=f"Експорт {kind}")
+        command.add_argument("--output", default="-")
+        command.add_argument("--format", choices=bulk.FORMATS)
+        if kind == "posts":
+            command.add_argument("--user-id", type=int)
+        command.set_defaults(action="export", kind=kind)
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        asyncio.run(database.wait_until_ready())
+        schema.upgrade()
+        print("✅ Міграції застосовано")
+        return 0
+
+    try:
+        if args.action == "import":
+            source = contextlib.nullcontext(sys.stdin) if args.path == "-" else open(args.path, encoding="utf-8", newline="")
+            with source as lines:
+                report = bulk.import_lines(args.kind, lines, _format(args, args.path))
+            print(json.dumps(report, ensure_ascii=False, indent=2))
+            return 1 if report["failed"] else 0
+
+        target = contextlib.nullcontext(sys.stdout) if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+        with target as output:
+            for chunk in bulk.export_lines(args.kind, _format(args, args.output), getattr(args, "user_id", None)):
+                output.write(chunk)
+        return 0
+    finally:
+        hashing.shutdown()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,11 @@
+from datetime import datetime, timezone
 from fastapi import HTTPException
-from passlib.context import CryptContext
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, pagination, search, hashing, response_cache, write_behind, tokens, feed
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+STREAM_CHUNK_SIZE = 1000
+USER_SORT_PATTERN = "^(-?id|-?last_login|relevance)$"  # Сортування /users/filter/
 
 
 def get_user_by_email(db: Session, email: str):
@@ -13,7 +15,7 @@ def get_user_by_email(db: Session, email: str):
 
 def create_user(db: Session, user: schemas.UserCreate):
     """Реєстрація нового користувача"""
-    hashed_password = pwd_context.hash(user.password)  # Хешуємо пароль
+    hashed_password = hashing.hash_password(user.password)  # Хешуємо пароль (у пулі хешування)
     db_user = models.User(
         email=user.email,
         password=hashed_password,
@@ -22,6 +24,7 @@ def create_user(db: Session, user: schemas.UserCreate):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    search.index_user(db_user)
     return db_user
 
 
@@ -30,28 +33,57 @@ def update_user(db: Session, user: models.User, user_update: schemas.UserUpdate)
     if user_update.full_name is not None:
         user.full_name = user_update.full_name
     if user_update.password is not None:
-        user.password = pwd_context.hash(user_update.password)
+        user.password = hashing.hash_password(user_update.password)
+        user.token_version = models.User.token_version + 1  # Старі токени стають недійсними
 
     db.commit()
     db.refresh(user)
+    search.index_user(user)
+    if user_update.password is not None:
+        tokens.set_token_version(user.id, user.token_version)
     return user
 
 
 def update_last_login(db: Session, user: models.User):
     """Оновлення часу входу користувача"""
+    if write_behind.WRITE_BEHIND:
+        write_behind.buffer.record(user.id, "last_login", datetime.utcnow())  # Запишеться пакетом
+        return
     user.last_login = datetime.utcnow()
     db.commit()
 
 
 def update_last_logout(db: Session, user: models.User):
     """Оновлення часу виходу користувача"""
+    if write_behind.WRITE_BEHIND:
+        write_behind.buffer.record(user.id, "last_logout", datetime.utcnow())
+        return
     user.last_logout = datetime.utcnow()
     db.commit()
 
 
-def get_all_users(db: Session):
-    """Отримати всіх користувачів"""
-    return db.query(models.User).all()
+def get_users_page(db: Session, cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE,
+                   entities=(models.User,)):
+    """Сторінка користувачів за id (keyset); повертає (users, next_cursor).
+
+    entities — що вибирати: ORM-модель або колонки (рядки-кортежі для fastjson).
+    """
+    query = db.query(*entities).order_by(models.User.id)
+    after_id = pagination.decode_id_cursor(cursor)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+
+    users = query.limit(limit + 1).all()  # Зайвий рядок показує, чи є наступна сторінка
+    return pagination.split_page(users, limit, pagination.user_key)
+
+
+def iter_users(db: Session, cursor: str = None, entities=(models.User,)):
+    """Потокове читання всіх користувачів порціями (yield_per)"""
+    query = db.query(*entities).order_by(models.User.id)
+    after_id = pagination.decode_id_cursor(cursor)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    return query.yield_per(STREAM_CHUNK_SIZE)
 
 
 def get_user_by_id(db: Session, user_id: int):
@@ -59,20 +91,88 @@ def get_user_by_id(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
 
-def filter_users(db: Session, user_id: int = None, email: str = None, full_name: str = None, last_login: str = None):
-    """Фільтрація користувачів за вказаними параметрами"""
+def _users_after(query, sort: str, cursor: str = None):
+    """Порядок і keyset-умова для сортувань id / last_login (з "-" — за спаданням).
+
+    NULL у last_login (ще не входили) у MySQL і SQLite йдуть першими за зростанням
+    і останніми за спаданням; умова курсора враховує цей сегмент окремо.
+    """
+    descending = sort.startswith("-")
+    if sort.lstrip("-") == "id":
+        query = query.order_by(models.User.id.desc() if descending else models.User.id)
+        values = pagination.decode_sort_cursor(cursor, sort, 1)
+        if values is not None:
+            if not isinstance(values[0], int):
+                raise HTTPException(status_code=400, detail="Некоректний курсор")
+            query = query.filter(models.User.id < values[0] if descending else models.User.id > values[0])
+        return query
+
+    column, user_id = models.User.last_login, models.User.id
+    if descending:
+        query = query.order_by(column.desc(), user_id.desc())
+    else:
+        query = query.order_by(column, user_id)
+    values = pagination.decode_sort_cursor(cursor, sort, 2)
+    if values is None:
+        return query
+    try:
+        last_login = datetime.fromisoformat(values[0]) if values[0] is not None else None
+        after_id = int(values[1])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некоректний курсор")
+
+    if last_login is None:
+        same = and_(column.is_(None), user_id < after_id if descending else user_id > after_id)
+        return query.filter(same if descending else or_(same, column.is_not(None)))
+    same = and_(column == last_login, user_id < after_id if descending else user_id > after_id)
+    if descending:
+        return query.filter(or_(column < last_login, same, column.is_(None)))
+    return query.filter(or_(column > last_login, same))
+
+
+def _user_sort_key(sort: str):
+    if sort.lstrip("-") == "id":
+        return lambda user: (sort, user.id)
+    return lambda user: (sort, user.last_login, user.id)
+
+
+def filter_users(db: Session, user_id: int = None, email: str = None, full_name: str = None,
+                 last_login: datetime = None, sort: str = None, cursor: str = None,
+                 limit: int = pagination.DEFAULT_PAGE_SIZE):
+    """Фільтрація користувачів; повертає (users, next_cursor).
+
+    Сортування: id, last_login (з "-" — за спаданням) або relevance для текстового пошуку
+    (за замовчуванням, якщо задано email / full_name). Вибирається limit+1 рядків,
+    тож "є ще" відомо без COUNT(*).
+    """
     query = db.query(models.User)
 
     if user_id:
         query = query.filter(models.User.id == user_id)
-    if email:
-        query = query.filter(models.User.email.ilike(f"%{email}%"))  # Пошук часткового збігу email
-    if full_name:
-        query = query.filter(models.User.full_name.ilike(f"%{full_name}%"))  # Пошук часткового збігу full_name
-    if last_login:
-        query = query.filter(models.User.last_login >= last_login)  # Фільтр по останньому входу (>=)
-
-    return query.all()
+    if last_login is not None:
+        if last_login.tzinfo is not None:
+            last_login = last_login.astimezone(timezone.utc).replace(tzinfo=None)  # У БД час UTC без зони
+        query = query.filter(models.User.last_login >= last_login)  # Діапазон по ix_users_last_login_id
+
+    text = email or full_name
+    sort = sort or ("relevance" if text else "id")
+    if sort == "relevance" and text:
+        # Ранжований пошук не має стабільного ключа, тому курсор — зсув у результатах
+        values = pagination.decode_sort_cursor(cursor, sort, 1)
+        offset = values[0] if values is not None else 0
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(status_code=400, detail="Некоректний курсор")
+        users = search.search_users(db, query, email, full_name, offset, limit + 1)
+        if len(users) <= limit:
+            return users, None
+        return users[:limit], pagination.encode_cursor(sort, offset + limit)
+    if sort == "relevance":
+        sort = "id"
+
+    if text:
+        query = search.filter_query(db, query, email, full_name)
+    users = _users_after(query, sort, cursor).limit(limit + 1).all()
+    return pagination.split_page(users, limit, _user_sort_key(sort))
 
 
 from sqlalchemy.orm import Session
@@ -80,9 +180,34 @@ from . import models, schemas
 from datetime import datetime
 
 
-def get_posts_by_user(db: Session, user_id: int):
-    """Отримання всіх постів користувача"""
-    return db.query(models.Post).filter(models.Post.user_id == user_id).all()
+def _posts_by_user_query(db: Session, user_id: int, cursor: str = None, entities=(models.Post,)):
+    """Пости користувача від найновіших, починаючи після курсора (created_at, id)"""
+    query = (
+        db.query(*entities)
+        .filter(models.Post.user_id == user_id)
+        .order_by(models.Post.created_at.desc(), models.Post.id.desc())
+    )
+    before = pagination.decode_time_id_cursor(cursor)
+    if before is not None:
+        created_at, post_id = before
+        # created_at <= c звужує діапазон індексу, OR уточнює межу всередині нього
+        query = query.filter(
+            models.Post.created_at <= created_at,
+            or_(models.Post.created_at < created_at, models.Post.id < post_id),
+        )
+    return query
+
+
+def get_posts_by_user(db: Session, user_id: int, cursor: str = None,
+                      limit: int = pagination.DEFAULT_PAGE_SIZE, entities=(models.Post,)):
+    """Сторінка постів користувача; повертає (posts, next_cursor)"""
+    posts = _posts_by_user_query(db, user_id, cursor, entities).limit(limit + 1).all()
+    return pagination.split_page(posts, limit, pagination.post_key)
+
+
+def iter_posts_by_user(db: Session, user_id: int, cursor: str = None, entities=(models.Post,)):
+    """Потокове читання всіх постів користувача порціями (yield_per)"""
+    return _posts_by_user_query(db, user_id, cursor, entities).yield_per(STREAM_CHUNK_SIZE)
 
 
 # .......................................................................
@@ -96,6 +221,8 @@ def create_post(db: Session, user: models.User, post_data: schemas.PostCreate):
     db.add(new_post)
     db.commit()
     db.refresh(new_post)
+    response_cache.invalidate_user(user.id)
+    feed.on_post_created(db, new_post)  # Кешовані стрічки підписників
     return new_post
 
 
@@ -111,6 +238,7 @@ def delete_post(db: Session, user: models.User, post_id: int):
 
     db.delete(post)
     db.commit()
+    response_cache.invalidate_user(user.id)
     return {"message": "Пост успішно видалено"}
 
 
@@ -129,4 +257,5 @@ def update_post(db: Session, user: models.User, post_id: int, post_update: schem
 
     db.commit()
     db.refresh(post)
+    response_cache.invalidate_user(user.id)
     return post
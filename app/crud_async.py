@@ -0,0 +1,166 @@
+"""Асинхронні версії функцій crud (DB_MODE=async, AsyncSession)"""
+import asyncio
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas, pagination, search, hashing, response_cache, crud, write_behind, tokens, feed
+
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    """Пошук користувача за email"""
+    return await db.scalar(select(models.User).where(models.User.email == email))
+
+
+async def create_user(db: AsyncSession, user: schemas.UserCreate):
+    """Реєстрація нового користувача"""
+    hashed_password = await hashing.ahash_password(user.password)
+    db_user = models.User(
+        email=user.email,
+        password=hashed_password,
+        full_name=user.full_name
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    search.index_user(db_user)
+    return db_user
+
+
+async def update_user(db: AsyncSession, user: models.User, user_update: schemas.UserUpdate):
+    """Оновлення користувача (тільки full_name та password)"""
+    if user_update.full_name is not None:
+        user.full_name = user_update.full_name
+    if user_update.password is not None:
+        user.password = await hashing.ahash_password(user_update.password)
+        user.token_version = models.User.token_version + 1  # Старі токени стають недійсними
+
+    await db.commit()
+    await db.refresh(user)
+    search.index_user(user)
+    if user_update.password is not None:
+        await asyncio.to_thread(tokens.set_token_version, user.id, user.token_version)
+    return user
+
+
+async def update_last_login(db: AsyncSession, user: models.User):
+    """Оновлення часу входу користувача"""
+    if write_behind.WRITE_BEHIND:
+        write_behind.buffer.record(user.id, "last_login", datetime.utcnow())
+        return
+    user.last_login = datetime.utcnow()
+    await db.commit()
+
+
+async def update_last_logout(db: AsyncSession, user: models.User):
+    """Оновлення часу виходу користувача"""
+    if write_behind.WRITE_BEHIND:
+        write_behind.buffer.record(user.id, "last_logout", datetime.utcnow())
+        return
+    user.last_logout = datetime.utcnow()
+    await db.commit()
+
+
+def users_statement(cursor: str = None, entities=(models.User,)):
+    """Користувачі за id після курсора"""
+    statement = select(*entities).order_by(models.User.id)
+    after_id = pagination.decode_id_cursor(cursor)
+    if after_id is not None:
+        statement = statement.where(models.User.id > after_id)
+    return statement
+
+
+async def get_users_page(db: AsyncSession, cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE,
+                         entities=(models.User,)):
+    """Сторінка користувачів за id (keyset); повертає (users, next_cursor)"""
+    result = await db.execute(users_statement(cursor, entities).limit(limit + 1))
+    users = result.scalars().all() if len(entities) == 1 else result.all()  # Як Query: одна сутність — скаляри
+    return pagination.split_page(users, limit, pagination.user_key)
+
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    """Пошук користувача за ID"""
+    return await db.get(models.User, user_id)
+
+
+async def filter_users(db: AsyncSession, user_id: int = None, email: str = None, full_name: str = None,
+                       last_login: datetime = None, sort: str = None, cursor: str = None,
+                       limit: int = pagination.DEFAULT_PAGE_SIZE):
+    """Фільтрація користувачів; пошуковий індекс працює через синхронний фасад сесії"""
+    return await db.run_sync(crud.filter_users, user_id, email, full_name, last_login, sort, cursor, limit)
+
+
+def posts_by_user_statement(user_id: int, cursor: str = None, entities=(models.Post,)):
+    """Пости користувача від найновіших, починаючи після курсора (created_at, id)"""
+    statement = (
+        select(*entities)
+        .where(models.Post.user_id == user_id)
+        .order_by(models.Post.created_at.desc(), models.Post.id.desc())
+    )
+    before = pagination.decode_time_id_cursor(cursor)
+    if before is not None:
+        created_at, post_id = before
+        statement = statement.where(
+            models.Post.created_at <= created_at,
+            or_(models.Post.created_at < created_at, models.Post.id < post_id),
+        )
+    return statement
+
+
+async def get_posts_by_user(db: AsyncSession, user_id: int, cursor: str = None,
+                            limit: int = pagination.DEFAULT_PAGE_SIZE, entities=(models.Post,)):
+    """Сторінка постів користувача; повертає (posts, next_cursor)"""
+    result = await db.execute(posts_by_user_statement(user_id, cursor, entities).limit(limit + 1))
+    posts = result.scalars().all() if len(entities) == 1 else result.all()
+    return pagination.split_page(posts, limit, pagination.post_key)
+
+
+async def create_post(db: AsyncSession, user: models.User, post_data: schemas.PostCreate):
+    """Створення нового поста для авторизованого користувача"""
+    new_post = models.Post(
+        text=post_data.text,
+        user_id=user.id
+    )
+    db.add(new_post)
+    await db.commit()
+    await db.refresh(new_post)
+    await asyncio.to_thread(response_cache.invalidate_user, user.id)
+    followers = await db.run_sync(feed.fanout_targets, new_post.user_id)
+    await asyncio.to_thread(feed.push_post, followers, new_post)
+    return new_post
+
+
+async def _own_post(db: AsyncSession, user: models.User, post_id: int, action: str):
+    post = await db.get(models.Post, post_id)
+
+    if not post:
+        raise HTTPException(status_code=404, detail="Пост не знайдено")
+
+    if post.user_id != user.id:
+        raise HTTPException(status_code=403, detail=f"Ви не можете {action} чужий пост")
+
+    return post
+
+
+async def delete_post(db: AsyncSession, user: models.User, post_id: int):
+    """Видалення поста (тільки власник може видалити свій пост)"""
+    post = await _own_post(db, user, post_id, "видалити")
+    await db.delete(post)
+    await db.commit()
+    await asyncio.to_thread(response_cache.invalidate_user, user.id)
+    return {"message": "Пост успішно видалено"}
+
+
+async def update_post(db: AsyncSession, user: models.User, post_id: int, post_update: schemas.PostUpdate):
+    """Редагування поста (тільки власник може змінити свій пост)"""
+    post = await _own_post(db, user, post_id, "редагувати")
+
+    post.text = post_update.text
+    post.updated_at = datetime.utcnow()
+
+    await db.commit()
+    await db.refresh(post)
+    await asyncio.to_thread(response_cache.invalidate_user, user.id)
+    return post
@@ -1,35 +1,236 @@
+import asyncio
+import threading
 import time
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
 from dotenv import load_dotenv
+from . import metrics
 
 load_dotenv()
 
-DATABASE_URL = f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}/{os.getenv('MYSQL_DATABASE')}"
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{os.getenv('MYSQL_USER')}:{os.getenv('MYSQL_PASSWORD')}@{os.getenv('MYSQL_HOST')}/{os.getenv('MYSQL_DATABASE')}"
 
-# Чекаємо на MySQL коли стане доступною
-for _ in range(10):  # 10 спроб з інтервалом у 3 секунди
-    try:
-        engine = create_engine(DATABASE_URL)
-        connection = engine.connect()
-        connection.close()
-        print("✅ MySQL підключено!")
-        break
-    except Exception as e:
-        print(f"❌ MySQL не відповідає, чекаємо... ({e})")
-        time.sleep(3)
-else:
-    raise Exception("❌ Неможливо підключитися до MySQL!")
-
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Режим роботи з БД: sync (pymysql, маршрути def) або async (asyncmy/aiosqlite, маршрути async def)
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Налаштування пулу з'єднань
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # Секунди; менше за wait_timeout MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))  # Очікування вільного з'єднання
+DB_READY_TIMEOUT = float(os.getenv("DB_READY_TIMEOUT", 2))  # Таймаут перевірки готовності
+DB_STARTUP_TIMEOUT = float(os.getenv("DB_STARTUP_TIMEOUT", 30))  # Скільки чекати БД при старті
+
+
+def async_url(url: str) -> str:
+    """Асинхронний драйвер для того самого DATABASE_URL"""
+    for sync_prefix, async_prefix in (("mysql+pymysql://", "mysql+asyncmy://"),
+                                      ("mysql://", "mysql+asyncmy://"),
+                                      ("sqlite://", "sqlite+aiosqlite://")):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+# Час очікування з'єднання з пулу та кількість таймаутів
+pool_wait = metrics.Histogram()
+pool_timeouts = 0
+
+
+class _TimedPoolMixin:
+    """Вимірює час очікування з'єднання з пулу"""
+
+    def _do_get(self):
+        global pool_timeouts
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts += 1
+            raise
+        finally:
+            pool_wait.observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _engine_options(url: str, poolclass) -> dict:
+    if url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":")):
+        return {}  # База в пам'яті живе в одному з'єднанні, пул не налаштовується
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_timeout": DB_POOL_TIMEOUT,
+    }
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+# expire_on_commit=False: після commit атрибути не перечитуються неявним (синхронним) запитом
+AsyncSessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+_engine = None
+_async_engine = None
+_engine_lock = threading.Lock()
+
+
+def make_engine(url: str):
+    """Engine з налаштованим пулом і метриками (основна БД або репліка)"""
+    engine = create_engine(url, **_engine_options(url, TimedQueuePool))
+    metrics.instrument_engine(engine)
+    return engine
+
+
+def make_async_engine(url: str):
+    engine = create_async_engine(url, **_engine_options(url, TimedAsyncQueuePool))
+    metrics.instrument_engine(engine.sync_engine)
+    return engine
+
+
+def get_engine():
+    """Engine створюється при першому зверненні, а не під час імпорту"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = make_engine(DATABASE_URL)
+                SessionLocal.configure(bind=_engine)
+    return _engine
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        with _engine_lock:
+            if _async_engine is None:
+                _async_engine = make_async_engine(ASYNC_DATABASE_URL)
+                AsyncSessionLocal.configure(bind=_async_engine)
+    return _async_engine
+
+
+def __getattr__(name):
+    # database.engine / database.async_engine як і раніше, але вже ліниво
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    raise AttributeError(name)
+
+
+def open_session():
+    get_engine()
+    return SessionLocal()
+
+
+def open_async_session():
+    get_async_engine()
+    return AsyncSessionLocal()
+
 
 def get_db():
-    db = SessionLocal()
+    db = open_session()
     try:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with open_async_session() as db:
+        yield db
+
+
+def _ping():
+    with get_engine().connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def check_ready(timeout: float = DB_READY_TIMEOUT) -> bool:
+    """Перевірка, що БД відповідає на SELECT 1 (без блокування event loop)"""
+    try:
+        if DB_MODE == "async":
+            async def ping():
+                async with get_async_engine().connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+            await asyncio.wait_for(ping(), timeout)
+        else:
+            await asyncio.wait_for(asyncio.to_thread(_ping), timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def wait_until_ready(timeout: float = DB_STARTUP_TIMEOUT, interval: float = 1):
+    """Очікування доступності БД при старті (замість циклу під час імпорту)"""
+    deadline = time.monotonic() + timeout
+    while not await check_ready():
+        if time.monotonic() >= deadline:
+            raise Exception("❌ Неможливо підключитися до бази даних!")
+        print("❌ База даних не відповідає, чекаємо...")
+        await asyncio.sleep(interval)
+    print("✅ База даних підключена!")
+
+
+def pool_stats():
+    """Стан пулів з'єднань і гістограма очікування з'єднання"""
+    stats = {"wait_seconds": pool_wait.snapshot(), "timeouts": pool_timeouts}
+    for name, engine in (("sync", _engine), ("async", _async_engine and _async_engine.sync_engine)):
+        pool = engine.pool if engine is not None else None
+        if isinstance(pool, QueuePool):
+            stats[name] = {"size": pool.size(), "checked_in": pool.checkedin(),
+                           "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+    return stats
+
+
+def prime_pool(size: int):
+    """Відкрити size з'єднань і повернути їх у пул, щоб перші запити не чекали на підключення"""
+    engine = get_engine()
+    connections = []
+    try:
+        for _ in range(size):
+            connections.append(engine.connect())
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def prime_async_pool(size: int):
+    engine = get_async_engine()
+    connections = [engine.connect() for _ in range(size)]
+    opened = await asyncio.gather(*(connection.start() for connection in connections), return_exceptions=True)
+    for connection in connections:
+        await connection.close()
+    for result in opened:
+        if isinstance(result, BaseException):
+            raise result
+
+
+def reset_after_fork():
+    """Після fork: з'єднання батьківського процесу не використовуються і не закриваються в дочірньому"""
+    if _engine is not None:
+        _engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
+
+async def dispose():
+    if _engine is not None:
+        _engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
@@ -0,0 +1,48 @@
+"""Швидка JSON-серіалізація списків (FAST_JSON=true).
+
+Замість ORM-об'єктів вибираються лише колонки схеми відповіді (рядки-кортежі без
+identity map), і вони одразу кодуються в JSON — без from_attributes-валідації
+Pydantic і другого проходу FastAPI по response_model.
+"""
+import os
+
+from dotenv import load_dotenv
+from fastapi import Response
+
+from . import models, schemas
+
+try:
+    import orjson
+except ImportError:  # Необов'язкова залежність: pydantic_core.to_json дає той самий формат
+    orjson = None
+    from pydantic_core import to_json
+
+load_dotenv()
+
+FAST_JSON = os.getenv("FAST_JSON", "false").lower() in ("1", "true", "yes")
+
+# Порядок полів як у схемах відповіді, щоб JSON збігався з повільним шляхом
+USER_FIELDS = tuple(schemas.UserResponse.model_fields)
+POST_FIELDS = tuple(schemas.PostResponse.model_fields)
+USER_COLUMNS = tuple(getattr(models.User, field) for field in USER_FIELDS)
+POST_COLUMNS = tuple(getattr(models.Post, field) for field in POST_FIELDS)
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return to_json(value)
+
+
+def dump_rows(rows, fields) -> bytes:
+    """JSON-масив об'єктів з рядків-кортежів (колонки в порядку fields)"""
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+def dump_line(row, fields) -> bytes:
+    """Один рядок NDJSON"""
+    return dumps(dict(zip(fields, row))) + b"\n"
+
+
+def rows_response(rows, fields, headers: dict = None) -> Response:
+    return Response(content=dump_rows(rows, fields), media_type="application/json", headers=headers)
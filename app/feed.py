@@ -0,0 +1,359 @@
+"""Підписки і стрічка /feed/: злиття найновіших постів авторів, на яких підписаний користувач.
+
+Для кожного автора береться не більше limit+1 постів по індексу
+ix_posts_user_id_created_at_id, а відсортовані потоки зливаються heapq.merge.
+Користувачам з багатьма підписками стрічка (ключі постів) зберігається у сховищі
+стрічок: новий пост додається в стрічки підписників автора і обрізається до
+FEED_CACHE_LENGTH (у Redis — ZADD + ZREMRANGEBYRANK в одній транзакції), тож
+читання не залежить від кількості підписок. Злиття потоків авторів лишається
+лише для холодного старту і бере з кожного автора не більше FEED_BUILD_PER_AUTHOR
+постів; будується стрічка з основної БД, щоб не закешувати відсталу репліку.
+"""
+import heapq
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import delete, or_, select, union_all
+from sqlalchemy.orm import Session
+
+from . import cache, models, pagination
+
+load_dotenv()
+
+FEED_CACHE_MIN_FOLLOWING = int(os.getenv("FEED_CACHE_MIN_FOLLOWING", 50))  # З якої кількості підписок кешувати
+FEED_CACHE_LENGTH = int(os.getenv("FEED_CACHE_LENGTH", 200))  # Скільки найновіших постів тримати в кеші
+FEED_CACHE_SIZE = int(os.getenv("FEED_CACHE_SIZE", 10000))
+FEED_CACHE_TTL = float(os.getenv("FEED_CACHE_TTL", 600))
+FEED_FANOUT_LIMIT = int(os.getenv("FEED_FANOUT_LIMIT", 10000))  # Більше підписників — лише TTL кешу
+FEED_BUILD_PER_AUTHOR = int(os.getenv("FEED_BUILD_PER_AUTHOR", 20))  # Постів з автора при холодному старті
+MERGE_BATCH = 200  # Авторів на один UNION ALL
+FANOUT_BATCH = 1000  # Підписників на одну транзакцію Redis
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class MemoryFeedStore:
+    """Стрічки в пам'яті процесу: user_id -> ключі (created_at, id) від найновіших"""
+
+    def __init__(self, maxsize: int, length: int, ttl: float):
+        self.maxsize = maxsize
+        self.length = length
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # user_id -> [expires_at, keys, complete | None — ще будується]
+        self._lock = threading.Lock()
+
+    def _entry(self, user_id: int, now: float):
+        entry = self._data.get(user_id)
+        if entry is not None and entry[0] < now:
+            del self._data[user_id]
+            return None
+        return entry
+
+    def get(self, user_id: int):
+        """(keys, complete) або None; промах резервує запис, щоб пости, створені
+        під час побудови, потрапили в нього через push"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(user_id, now)
+            if entry is None or entry[2] is None:
+                if entry is None:
+                    self._data[user_id] = [now + self.ttl, [], None]
+                    self._evict()
+                self.misses += 1
+                return None
+            self._data.move_to_end(user_id)
+            self.hits += 1
+            return list(entry[1]), entry[2] and len(entry[1]) < self.length
+
+    def build(self, user_id: int, keys, complete: bool):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entry(user_id, now)
+            pushed = entry[1] if entry is not None else []
+            merged = sorted(set(keys) | set(pushed), reverse=True)
+            self._data[user_id] = [now + self.ttl, merged[:self.length], complete]
+            self._evict()
+
+    def push(self, user_ids, key):
+        """Новий пост у наявні стрічки (read-modify-write під блокуванням)"""
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                entry = self._entry(user_id, now)
+                if entry is None:
+                    continue  # Холодна стрічка побудується з БД при читанні
+                keys = entry[1]
+                if key not in keys:
+                    keys.append(key)
+                    keys.sort(reverse=True)
+                    del keys[self.length:]
+
+    def delete(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                self._data.pop(user_id, None)
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def stats(self):
+        return {"backend": "memory", "size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+
+class RedisFeedStore:
+    """Стрічки в Redis: sorted set "feed:<id>" (оцінка — created_at) і "feed:<id>:meta" (повнота).
+
+    Пост додається в стрічки підписників безумовно (ZADD + обрізання + EXPIRE NX в MULTI):
+    так він не загубиться, навіть якщо стрічку саме будують; без meta стрічка вважається
+    холодною, і побудова об'єднує свої ключі з уже доданими.
+    """
+
+    def __init__(self, client, length: int, ttl: float, namespace: str = "feed"):
+        self.client = client
+        self.length = length
+        self.ttl = max(1, int(ttl))
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.namespace}:{user_id}"
+
+    @staticmethod
+    def _member(key) -> str:
+        created_at, post_id = key
+        return f"{created_at.isoformat()}|{post_id:020d}"  # За рівної оцінки Redis порівнює рядки
+
+    @staticmethod
+    def _score(key) -> float:
+        return (key[0] - _EPOCH).total_seconds()
+
+    def _add(self, pipe, user_id: int, keys):
+        pipe.zadd(self._key(user_id), {self._member(key): self._score(key) for key in keys})
+        pipe.zremrangebyrank(self._key(user_id), 0, -self.length - 1)
+
+    def get(self, user_id: int):
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(self._key(user_id) + ":meta")
+        pipe.zrevrange(self._key(user_id), 0, -1)
+        meta, members = pipe.execute()
+        if meta is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        keys = []
+        for member in members:
+            created_at, post_id = cache._decode(member).split("|")
+            keys.append((datetime.fromisoformat(created_at), int(post_id)))
+        return keys, cache._decode(meta) == "1" and len(keys) < self.length
+
+    def build(self, user_id: int, keys, complete: bool):
+        pipe = self.client.pipeline()
+        if keys:
+            self._add(pipe, user_id, keys)
+        pipe.expire(self._key(user_id), self.ttl)
+        pipe.set(self._key(user_id) + ":meta", "1" if complete else "0", ex=self.ttl)
+        pipe.execute()
+
+    def push(self, user_ids, key):
+        user_ids = list(user_ids)
+        for start in range(0, len(user_ids), FANOUT_BATCH):
+            pipe = self.client.pipeline()
+            for user_id in user_ids[start:start + FANOUT_BATCH]:
+                self._add(pipe, user_id, [key])
+                pipe.expire(self._key(user_id), self.ttl, nx=True)
+            pipe.execute()
+
+    def delete(self, user_ids):
+        names = [name for user_id in user_ids for name in (self._key(user_id), self._key(user_id) + ":meta")]
+        if names:
+            self.client.delete(*names)
+
+    def stats(self):
+        return {"backend": "redis", "hits": self.hits, "misses": self.misses}
+
+
+def make_store():
+    if cache.CACHE_BACKEND == "memory":
+        return MemoryFeedStore(FEED_CACHE_SIZE, FEED_CACHE_LENGTH, FEED_CACHE_TTL)
+    return RedisFeedStore(cache.get_redis_client(), FEED_CACHE_LENGTH, FEED_CACHE_TTL)
+
+
+feed_store = make_store()
+cache.caches["feed"] = feed_store  # Статистика разом з кешами
+
+
+def follow(db: Session, follower_id: int, followee_id: int):
+    """Підписка (повторна підписка нічого не змінює)"""
+    if follower_id == followee_id:
+        raise HTTPException(status_code=400, detail="Не можна підписатися на себе")
+    if db.get(models.User, followee_id) is None:
+        raise HTTPException(status_code=404, detail="Користувача не знайдено")
+    if db.get(models.Follow, (follower_id, followee_id)) is None:
+        db.add(models.Follow(follower_id=follower_id, followee_id=followee_id))
+        db.commit()
+        feed_store.delete([follower_id])
+    return {"message": "Підписку оформлено"}
+
+
+def unfollow(db: Session, follower_id: int, followee_id: int):
+    """Скасування підписки"""
+    link = db.get(models.Follow, (follower_id, followee_id))
+    if link is None:
+        raise HTTPException(status_code=404, detail="Підписку не знайдено")
+    db.delete(link)
+    db.commit()
+    feed_store.delete([follower_id])
+    return {"message": "Підписку скасовано"}
+
+
+def remove_user(db: Session, user_id: int):
+    """Видалення підписок користувача і на користувача (перед видаленням акаунта)"""
+    follows = models.Follow.__table__
+    db.execute(delete(follows).where(or_(follows.c.follower_id == user_id, follows.c.followee_id == user_id)))
+    feed_store.delete([user_id])
+
+
+def following_ids(db: Session, user_id: int):
+    return db.scalars(select(models.Follow.followee_id).where(models.Follow.follower_id == user_id)).all()
+
+
+def _author_streams(db: Session, authors, before, per_author: int):
+    """Ключі (created_at, id) найновіших постів кожного автора — по спадному списку на автора"""
+    posts = models.Post.__table__
+    streams = []
+    for start in range(0, len(authors), MERGE_BATCH):
+        branches = []
+        for author_id in authors[start:start + MERGE_BATCH]:
+            branch = select(posts.c.user_id, posts.c.created_at, posts.c.id).where(posts.c.user_id == author_id)
+            if before is not None:
+                created_at, post_id = before
+                branch = branch.where(posts.c.created_at <= created_at,
+                                      or_(posts.c.created_at < created_at, posts.c.id < post_id))
+            # Кожна гілка — діапазон індексу (user_id, created_at, id) з LIMIT
+            branch = branch.order_by(posts.c.created_at.desc(), posts.c.id.desc()).limit(per_author)
+            branches.append(select(branch.subquery()))
+        by_author = {}
+        for user_id, created_at, post_id in db.execute(union_all(*branches)):
+            by_author.setdefault(user_id, []).append((created_at, post_id))
+        streams.extend(sorted(rows, reverse=True) for rows in by_author.values())
+    return streams
+
+
+def _newest_keys(db: Session, authors, before, per_author: int):
+    """Потоки авторів, злиті в один спадний потік"""
+    return heapq.merge(*_author_streams(db, authors, before, per_author), reverse=True)
+
+
+def _load_posts(db: Session, keys):
+    """Пости за id у порядку ключів (видалені після кешування пропускаються)"""
+    ids = [post_id for _, post_id in keys]
+    if not ids:
+        return []
+    found = {post.id: post for post in db.scalars(select(models.Post).where(models.Post.id.in_(ids)))}
+    return [found[post_id] for post_id in ids if post_id in found]
+
+
+def _merge_page(db: Session, authors, before, limit: int):
+    keys = []
+    for key in _newest_keys(db, authors, before, limit + 1):
+        keys.append(key)
+        if len(keys) > limit:
+            break
+    return keys
+
+
+def _build_keys(db: Session, authors):
+    """Холодний старт: не більше FEED_BUILD_PER_AUTHOR постів з кожного автора.
+
+    Ключі точні до найновішого з "останніх" ключів обрізаних потоків: нижче за нього
+    могли лишитися невибрані пости, тож такий список позначається неповним.
+    """
+    streams = _author_streams(db, authors, None, FEED_BUILD_PER_AUTHOR)
+    capped = [stream[-1] for stream in streams if len(stream) >= FEED_BUILD_PER_AUTHOR]
+    boundary = max(capped) if capped else None
+    keys = []
+    for key in heapq.merge(*streams, reverse=True):
+        if (boundary is not None and key < boundary) or len(keys) > FEED_CACHE_LENGTH:
+            break
+        keys.append(key)
+    complete = boundary is None and len(keys) <= FEED_CACHE_LENGTH
+    return keys[:FEED_CACHE_LENGTH], complete
+
+
+def _cached_keys(primary: Session, user_id: int, authors):
+    """Кешована стрічка; при першому читанні будується з основної БД (primary)"""
+    entry = feed_store.get(user_id)
+    if entry is None:
+        keys, complete = _build_keys(primary, authors)
+        feed_store.build(user_id, keys, complete)
+        entry = keys, complete and len(keys) < FEED_CACHE_LENGTH
+    return entry
+
+
+def get_feed(db: Session, user_id: int, cursor: str = None, limit: int = pagination.DEFAULT_PAGE_SIZE,
+             primary: Session = None):
+    """Сторінка стрічки від найновіших; повертає (posts, next_cursor).
+
+    db може бути сесією репліки; кешована стрічка будується лише з primary (основна БД).
+    """
+    before = pagination.decode_time_id_cursor(cursor)
+    authors = following_ids(db, user_id)
+    if not authors:
+        return [], None
+
+    keys = None
+    if len(authors) >= FEED_CACHE_MIN_FOLLOWING:
+        cached, complete = _cached_keys(primary or db, user_id, authors)
+        if before is not None:
+            cached = [key for key in cached if key < tuple(before)]
+        if complete or len(cached) > limit:
+            keys = cached[:limit + 1]
+    if keys is None:
+        keys = _merge_page(db, authors, before, limit)
+
+    posts = _load_posts(db, keys[:limit])
+    next_cursor = pagination.encode_cursor(*keys[limit - 1]) if len(keys) > limit else None
+    return posts, next_cursor
+
+
+def fanout_targets(db: Session, author_id: int):
+    """Підписники, у чиї кешовані стрічки додається пост автора ([] — занадто багато)"""
+    followers = db.scalars(
+        select(models.Follow.follower_id).where(models.Follow.followee_id == author_id)
+        .limit(FEED_FANOUT_LIMIT + 1)
+    ).all()
+    if len(followers) > FEED_FANOUT_LIMIT:
+        return []  # Дуже популярний автор: стрічки підписників оновляться після FEED_CACHE_TTL
+    return followers
+
+
+def push_post(follower_ids, post: models.Post):
+    """Додати пост у кешовані стрічки підписників (з обрізанням до FEED_CACHE_LENGTH)"""
+    feed_store.push(follower_ids, (post.created_at, post.id))
+
+
+def on_post_created(db: Session, post: models.Post):
+    """Додати новий пост у кешовані стрічки підписників автора"""
+    push_post(fanout_targets(db, post.user_id), post)
+
+
+def invalidate_followers(db, author_ids):
+    """Скидання кешованих стрічок усіх підписників авторів (масовий імпорт: пости з довільними
+    датами не додаються в стрічки, а стрічки перебудовуються при наступному читанні)"""
+    if not author_ids:
+        return
+    followers = db.scalars(
+        select(models.Follow.follower_id).where(models.Follow.followee_id.in_(list(author_ids))).distinct()
+    ).all()
+    for start in range(0, len(followers), FANOUT_BATCH):
+        feed_store.delete(followers[start:start + FANOUT_BATCH])
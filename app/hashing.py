@@ -0,0 +1,195 @@
+import asyncio
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from . import metrics
+
+load_dotenv()
+
+HASH_POOL = os.getenv("HASH_POOL", "process")  # process | thread | inline
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 1))
+HASH_MAX_PENDING = int(os.getenv("HASH_MAX_PENDING", HASH_WORKERS * 4))  # Ліміт задач у пулі (з чергою)
+HASH_TIMEOUT = float(os.getenv("HASH_TIMEOUT", 10))
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+# Хеші з іншою вартістю (rounds) needs_update() позначає як застарілі
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = None
+_dummy_hash = None
+_lock = threading.Lock()
+_pending = 0
+_counters = {"submitted": 0, "completed": 0, "rejected": 0, "timeouts": 0, "max_pending_seen": 0}
+
+
+# Функції, що виконуються у процесах пулу (мають бути на рівні модуля)
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str):
+    return pwd_context.verify_and_update(password, hashed)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            return _executor
+        if HASH_POOL == "process":
+            # spawn: дочірні процеси не успадковують з'єднання з БД та інший стан батька
+            _executor = ProcessPoolExecutor(HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        else:
+            _executor = ThreadPoolExecutor(HASH_WORKERS, thread_name_prefix="hashing")
+        return _executor
+
+
+def _overloaded():
+    return HTTPException(
+        status_code=503,
+        detail="Сервер перевантажений, спробуйте пізніше",
+        headers={"Retry-After": "1"},
+    )
+
+
+def _done(_future):
+    global _pending
+    with _lock:
+        _pending -= 1
+        _counters["completed"] += 1
+
+
+def _submit(fn, *args) -> Future:
+    """Постановка задачі в пул; якщо пул заповнений — одразу 503"""
+    global _pending
+    if HASH_POOL == "inline":
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    with _lock:
+        if _pending >= HASH_MAX_PENDING:
+            _counters["rejected"] += 1
+            raise _overloaded()
+        _pending += 1
+        _counters["submitted"] += 1
+        _counters["max_pending_seen"] = max(_counters["max_pending_seen"], _pending)
+    try:
+        future = _get_executor().submit(fn, *args)
+    except Exception:
+        _done(None)
+        raise
+    future.add_done_callback(_done)
+    return future
+
+
+def _result(future: Future):
+    try:
+        return future.result(HASH_TIMEOUT)
+    except FutureTimeoutError:
+        with _lock:
+            _counters["timeouts"] += 1
+        raise _overloaded()
+
+
+def hash_password(password: str) -> str:
+    with metrics.timer("bcrypt_hash"):
+        return _result(_submit(_hash, password))
+
+
+def hash_many(passwords) -> list:
+    """Паралельне хешування для масового імпорту.
+
+    Задачі подаються хвилями по HASH_WORKERS, тож інтерактивні входи не стоять
+    у черзі за тисячами хешів; якщо пул зайнятий — чекаємо, а не відмовляємо.
+    """
+    passwords = list(passwords)
+    hashes = []
+    for start in range(0, len(passwords), HASH_WORKERS):
+        futures = []
+        for password in passwords[start:start + HASH_WORKERS]:
+            while HASH_POOL != "inline" and _pending >= HASH_MAX_PENDING:
+                time.sleep(0.05)
+            futures.append(_submit(_hash, password))
+        hashes.extend(_result(future) for future in futures)
+    return hashes
+
+
+def verify_and_update(password: str, hashed: str):
+    """(чи збігається пароль, новий хеш або None, якщо перехешування не потрібне)"""
+    with metrics.timer("bcrypt_verify"):
+        return _result(_submit(_verify_and_update, password, hashed))
+
+
+def verify_password(password: str, hashed: str) -> bool:
+    return verify_and_update(password, hashed)[0]
+
+
+async def _aresult(future: Future):
+    """Очікування результату без блокування event loop (для async-маршрутів)"""
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        with _lock:
+            _counters["timeouts"] += 1
+        raise _overloaded()
+
+
+async def ahash_password(password: str) -> str:
+    with metrics.timer("bcrypt_hash"):
+        return await _aresult(_submit(_hash, password))
+
+
+async def averify_and_update(password: str, hashed: str):
+    with metrics.timer("bcrypt_verify"):
+        return await _aresult(_submit(_verify_and_update, password, hashed))
+
+
+def dummy_hash() -> str:
+    """Хеш випадкового пароля з поточною вартістю: для невідомих email перевірка триває
+    стільки ж, скільки для справжніх, і час відповіді не видає, чи існує акаунт"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = pwd_context.hash(secrets.token_urlsafe(16))
+    return _dummy_hash
+
+
+def warmup():
+    """Запуск процесів пулу та перший виклик bcrypt до прийому запитів"""
+    hashed = pwd_context.handler("bcrypt").using(rounds=4).hash("warmup")  # Важливий запуск пулу, а не вартість
+    if HASH_POOL == "inline":
+        pwd_context.verify("warmup", hashed)
+        return
+    futures = [_get_executor().submit(_verify_and_update, "warmup", hashed) for _ in range(HASH_WORKERS)]
+    for future in futures:
+        future.result(timeout=HASH_TIMEOUT * 3)
+    dummy_hash()
+
+
+def reset_after_fork():
+    """Після fork: пул батьківського процесу (процеси / потоки) в дочірньому непридатний"""
+    global _executor, _pending, _lock
+    _executor = None
+    _pending = 0
+    _lock = threading.Lock()
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def stats():
+    return {"pool": HASH_POOL, "workers": HASH_WORKERS, "max_pending": HASH_MAX_PENDING,
+            "pending": _pending, **_counters}
@@ -0,0 +1,70 @@
+"""Життєвий цикл процесу сервера: очікування БД, міграції, прогрів і коректне завершення.
+
+У продакшн-профілі (gunicorn.conf.py) схему оновлює окремий одноразовий крок
+`python -m app.cli migrate`, а кожен воркер при старті лише прогріває пул з'єднань,
+пул bcrypt і ключі JWT, щоб перші запити не платили за ініціалізацію.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+
+from . import cache, database, hashing, metrics, replicas, schema, tokens, write_behind
+
+load_dotenv()
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+WARMUP = os.getenv("WARMUP", "true").lower() in ("1", "true", "yes")
+WARMUP_POOL_CONNECTIONS = int(os.getenv("WARMUP_POOL_CONNECTIONS", database.DB_POOL_SIZE))
+
+
+async def warmup():
+    """Відкриття з'єднань пулу, запуск пулу хешування і пробний підпис токена"""
+    if database.DB_MODE == "async":
+        await database.prime_async_pool(WARMUP_POOL_CONNECTIONS)
+    else:
+        await asyncio.to_thread(database.prime_pool, WARMUP_POOL_CONNECTIONS)
+    await asyncio.to_thread(hashing.warmup)
+    tokens.warmup()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Чекаємо на БД замість фіксованої паузи; міграції — лише якщо їх не виконав окремий крок
+    await database.wait_until_ready()
+    if MIGRATE_ON_STARTUP:
+        print("✅ Застосовуємо міграції схеми...")
+        await asyncio.to_thread(schema.upgrade)
+    if WARMUP:
+        await warmup()
+        print("✅ Прогрів завершено")
+    monitor = asyncio.create_task(replicas.monitor()) if replicas.replicas else None
+    metrics.start_multiprocess()
+    yield
+    if monitor is not None:
+        monitor.cancel()
+    hashing.shutdown()
+    await asyncio.to_thread(write_behind.buffer.stop)  # Дописуємо відкладені last_login/last_logout
+    await replicas.dispose()
+    await database.dispose()
+    await asyncio.to_thread(metrics.stop_multiprocess)
+
+
+def after_fork():
+    """Стан, успадкований від батьківського процесу (preload_app), у воркері не використовується"""
+    database.reset_after_fork()
+    replicas.reset_after_fork()
+    hashing.reset_after_fork()
+    write_behind.buffer.reset_after_fork()
+    metrics.reset_after_fork()
+
+
+def check_shared_state(workers: int):
+    """Denylist, версії токенів, principal-кеш, сторінки постів і стрічки інвалідуються
+    при записі; з кількома воркерами вони мають бути спільними (CACHE_BACKEND=redis)"""
+    if workers > 1 and cache.CACHE_BACKEND != "redis":
+        raise RuntimeError(
+            f"{workers} воркерів з CACHE_BACKEND={cache.CACHE_BACKEND}: відкликані токени і скинуті кеші "
+            "не будуть видні іншим воркерам. Задайте CACHE_BACKEND=redis (REDIS_URL) або WEB_CONCURRENCY=1"
+        )
@@ -1,21 +1,74 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import APIRouter, FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-from . import models, schemas, database, crud, auth
+from . import models, schemas, database, crud, auth, pagination, search, cache, hashing, routes_async, response_cache, write_behind, bulk, metrics, tokens, feed, fastjson, lifecycle, replicas, ratelimit
+from datetime import datetime
 from typing import List
 
-app = FastAPI()
+app = FastAPI(lifespan=lifecycle.lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_serialization()
 
+# Маршрути синхронного режиму; у DB_MODE=async підключається routes_async.router
+router = APIRouter()
 
-# Створюємо таблиці при старті сервера
-@app.on_event("startup")
-def startup():
-    print("✅ Перевіряємо, чи створені таблиці...")
-    models.Base.metadata.create_all(bind=database.engine)
+
+# ✅ Liveness: процес живий (без звернення до БД)
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+# ✅ Readiness: БД відповідає; також стан пулу з'єднань і реплік (недоступна репліка не робить сервер неготовим)
+@app.get("/readyz")
+async def readyz():
+    ready = await database.check_ready()
+    body = {"status": "ready" if ready else "unavailable", "pool": database.pool_stats(),
+            "replicas": replicas.stats()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+def _numeric(stats: dict):
+    return {key: value for key, value in stats.items() if isinstance(value, (int, float))}
+
+
+def _stats_gauges():
+    """Поточні значення з /cache/stats/ (кеші, пул хешування, пул БД, write-behind) для /metrics"""
+    for name, stats in cache.stats().items():
+        for key, value in _numeric(stats).items():
+            yield f"app_cache_{key}", f"Кеш: {key}", {"cache": name}, value
+    for key, value in _numeric(hashing.stats()).items():
+        yield f"app_hashing_{key}", f"Пул хешування: {key}", {}, value
+    for key, value in _numeric(write_behind.stats()).items():
+        yield f"app_write_behind_{key}", f"Відкладений запис: {key}", {}, value
+    pool = database.pool_stats()
+    yield "app_db_pool_timeouts", "Тайм-аути очікування з'єднання", {}, pool["timeouts"]
+    yield "app_db_pool_wait_seconds_sum", "Сумарне очікування з'єднання", {}, pool["wait_seconds"]["sum"]
+    yield "app_db_pool_wait_seconds_count", "Кількість видач з'єднань", {}, pool["wait_seconds"]["count"]
+    for engine in ("sync", "async"):
+        for key, value in pool.get(engine, {}).items():
+            yield f"app_db_pool_{key}", f"Пул з'єднань: {key}", {"engine": engine}, value
+
+
+metrics.collectors.append(_stats_gauges)
+
+
+# ✅ Відкриті ключі підпису токенів (EdDSA / RS256) для локальної перевірки іншими сервісами
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+def jwks():
+    return tokens.jwks()
+
+
+# ✅ Метрики у форматі Prometheus: затримки маршрутів, SQL, bcrypt/JWT/серіалізація, стан пулів і кешів
+# (з METRICS_MULTIPROC_DIR — сума по всіх воркерах, див. gunicorn.conf.py)
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 # ✅ Реєстрація користувача
-@app.post("/register/", response_model=schemas.UserResponse)
+@router.post("/register/", response_model=schemas.UserResponse)
 def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_db)):
     db_user = crud.get_user_by_email(db, user.email)
     if db_user:
@@ -24,13 +77,26 @@ def register_user(user: schemas.UserCreate, db: Session = Depends(database.get_d
 
 
 # ✅ Логін користувача
-@app.post("/login/", response_model=schemas.Token)
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+# Ліміт спроб за IP і акаунтом перевіряється до БД і bcrypt; невідомий email перевіряється фіктивним хешем
+@router.post("/login/", response_model=schemas.Token)
+def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends(),
+               db: Session = Depends(database.get_db)):
+    ratelimit.check_login(request, form_data.username)
     user = crud.get_user_by_email(db, form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.password):
+    if not user:
+        auth.verify_and_update_password(form_data.password, hashing.dummy_hash())
+        ratelimit.login_failed(form_data.username, "unknown_user")
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    verified, new_hash = auth.verify_and_update_password(form_data.password, user.password)
+    if not verified:
+        ratelimit.login_failed(form_data.username, "bad_password")
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    ratelimit.login_succeeded(form_data.username)
+    if new_hash:
+        user.password = new_hash  # Перехешування зі зміненою вартістю bcrypt
+        db.commit()
 
-    access_token = auth.create_access_token(data={"sub": user.email})
+    access_token = auth.create_access_token(data=auth.token_claims(user))
 
     # Оновлюємо час входу
     crud.update_last_login(db, user)
@@ -39,49 +105,89 @@ def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = D
 
 
 # ✅ Видалення користувача
-@app.delete("/users/me/", status_code=204)
+@router.delete("/users/me/", status_code=204)
 def delete_current_user(
         db: Session = Depends(database.get_db),
         current_user: models.User = Depends(auth.get_current_user)
 ):
+    feed.remove_user(db, current_user.id)
     db.delete(current_user)
     db.commit()
+    search.remove_user(current_user.id)
+    auth.invalidate_principal(current_user.email)
+    tokens.revoke_user(current_user.id)
+    response_cache.invalidate_user(current_user.id)
     return {"message": "User deleted successfully"}
 
 
 # ✅ Оновлення користувача
-@app.put("/users/me/", response_model=schemas.UserResponse)
+@router.put("/users/me/", response_model=schemas.UserResponse)
 def update_current_user(
         user_update: schemas.UserUpdate,
         db: Session = Depends(database.get_db),
         current_user: models.User = Depends(auth.get_current_user),
 ):
     updated_user = crud.update_user(db, current_user, user_update)
+    auth.invalidate_principal(updated_user.email)
     return updated_user
 
 
-# ✅ Вихід користувача (оновлення last_logout)
-@app.post("/logout/", status_code=200)
-def logout_user(db: Session = Depends(database.get_db), current_user: models.User = Depends(auth.get_current_user)):
+# ✅ Вихід користувача (оновлення last_logout, поточний токен потрапляє в denylist)
+@router.post("/logout/", status_code=200)
+def logout_user(
+        db: Session = Depends(database.get_db),
+        current_user: models.User = Depends(auth.get_current_user),
+        identity: schemas.TokenData = Depends(auth.get_current_identity),
+):
     crud.update_last_logout(db, current_user)
+    auth.invalidate_principal(current_user.email)
+    auth.revoke_token(identity)
     return {"message": "Logout successful"}
 
 
+# ✅ Статистика кешів (hit/miss) та пулу хешування для підбору розмірів
+@router.get("/cache/stats/")
+def cache_stats(current_user: schemas.TokenData = Depends(auth.get_current_identity)):
+    return {**cache.stats(), "hashing": hashing.stats(), "db_pool": database.pool_stats(),
+            "write_behind": write_behind.stats()}
+
+
 # ✅ Отримання всіх користувачів (авторизовані)
-@app.get("/users/", response_model=List[schemas.UserResponse])
+# Сторінки по id: курсор наступної сторінки повертається у заголовку X-Next-Cursor,
+# stream=true віддає всю таблицю як NDJSON без накопичення в пам'яті
+@router.get("/users/", response_model=List[schemas.UserResponse])
 def get_users(
-        db: Session = Depends(database.get_db),
+        response: Response,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        stream: bool = False,
+        db: Session = Depends(replicas.get_read_db),
         current_user: models.User = Depends(auth.get_current_user)
 ):
-    return crud.get_all_users(db)
+    if stream:
+        pagination.decode_id_cursor(cursor)  # Перевіряємо курсор до початку потоку
+        if fastjson.FAST_JSON:
+            return pagination.ndjson_response(lambda s: crud.iter_users(s, cursor, fastjson.USER_COLUMNS),
+                                              schemas.UserResponse, fastjson.USER_FIELDS)
+        return pagination.ndjson_response(lambda s: crud.iter_users(s, cursor), schemas.UserResponse)
+
+    if fastjson.FAST_JSON:
+        rows, next_cursor = crud.get_users_page(db, cursor, limit, fastjson.USER_COLUMNS)
+        return fastjson.rows_response(rows, fastjson.USER_FIELDS,
+                                      {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+    users, next_cursor = crud.get_users_page(db, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 
 # ✅ Пошук користувача за ID або Email
-@app.get("/users/search/", response_model=schemas.UserResponse)
+@router.get("/users/search/", response_model=schemas.UserResponse)
 def search_user(
         user_id: int = None,
         email: str = None,
-        db: Session = Depends(database.get_db),
+        db: Session = Depends(replicas.get_read_db),
         current_user: models.User = Depends(auth.get_current_user)
 ):
     if user_id:
@@ -98,58 +204,166 @@ def search_user(
 
 
 # ✅ Фільтрація користувачів
-@app.get("/users/filter/", response_model=List[schemas.UserResponse])
+# Сторінки за курсором (X-Next-Cursor, X-Has-More); sort: id, last_login, relevance ("-" — за спаданням)
+@router.get("/users/filter/", response_model=List[schemas.UserResponse])
 def filter_users(
+        response: Response,
         user_id: int = None,
         email: str = None,
         full_name: str = None,
-        last_login: str = None,
-        db: Session = Depends(database.get_db),
+        last_login: datetime = None,
+        sort: str = Query(None, pattern=crud.USER_SORT_PATTERN),
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        db: Session = Depends(replicas.get_read_db),
         current_user: models.User = Depends(auth.get_current_user)
 ):
-    users = crud.filter_users(db, user_id, email, full_name, last_login)
+    users, next_cursor = crud.filter_users(db, user_id, email, full_name, last_login, sort, cursor, limit)
 
-    if not users:
+    if not users and cursor is None:
         raise HTTPException(status_code=404, detail="Користувачів не знайдено")
 
+    response.headers["X-Has-More"] = "true" if next_cursor else "false"
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return users
 
 
 # ✅ Отримання постів користувача (неавторизовані)
-@app.get("/users/{user_id}/posts/", response_model=list[schemas.PostResponse])
-def get_user_posts(user_id: int, db: Session = Depends(database.get_db)):
-    posts = crud.get_posts_by_user(db, user_id)
-    if not posts:
-        raise HTTPException(status_code=404, detail="Користувач не має постів")
-    return posts
-
-
-@app.post("/posts/", response_model=schemas.PostResponse)
+# Відповіді кешуються; за збігу If-None-Match повертається 304 без звернення до БД
+@router.get("/users/{user_id}/posts/", response_model=list[schemas.PostResponse])
+def get_user_posts(
+        user_id: int,
+        request: Request,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        stream: bool = False,
+        db: Session = Depends(replicas.get_read_db)
+):
+    if stream:
+        pagination.decode_time_id_cursor(cursor)
+        if fastjson.FAST_JSON:
+            return pagination.ndjson_response(
+                lambda s: crud.iter_posts_by_user(s, user_id, cursor, fastjson.POST_COLUMNS),
+                schemas.PostResponse, fastjson.POST_FIELDS
+            )
+        return pagination.ndjson_response(
+            lambda s: crud.iter_posts_by_user(s, user_id, cursor), schemas.PostResponse
+        )
+
+    entry, generation = response_cache.get_posts(user_id, cursor, limit)
+    if entry is None:
+        columns = fastjson.POST_COLUMNS if fastjson.FAST_JSON else (models.Post,)
+        posts, next_cursor = crud.get_posts_by_user(db, user_id, cursor, limit, columns)
+        if not posts and cursor is None:
+            raise HTTPException(status_code=404, detail="Користувач не має постів")
+        entry = response_cache.store_posts(user_id, cursor, limit, posts, next_cursor, generation)
+    return response_cache.respond(request, entry)
+
+
+@router.post("/posts/", response_model=schemas.PostResponse)
 def create_post(
         post_data: schemas.PostCreate,
         db: Session = Depends(database.get_db),
-        current_user: models.User = Depends(auth.get_current_user)  # Авторизація
+        current_user: schemas.TokenData = Depends(auth.get_current_identity)  # Авторизація
 ):
     """Створення поста (тільки для авторизованих)"""
     return crud.create_post(db, current_user, post_data)
 
 
-@app.delete("/posts/{post_id}/")
+@router.delete("/posts/{post_id}/")
 def delete_post(
         post_id: int,
         db: Session = Depends(database.get_db),
-        current_user: models.User = Depends(auth.get_current_user)  # Авторизація
+        current_user: schemas.TokenData = Depends(auth.get_current_identity)  # Авторизація
 ):
     """Видалення поста (тільки для власника)"""
     return crud.delete_post(db, current_user, post_id)
 
 
-@app.put("/posts/{post_id}/", response_model=schemas.PostResponse)
+@router.put("/posts/{post_id}/", response_model=schemas.PostResponse)
 def edit_post(
         post_id: int,
         post_update: schemas.PostUpdate,
         db: Session = Depends(database.get_db),
-        current_user: models.User = Depends(auth.get_current_user),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
 ):
     """Редагування поста (може редагувати лише власник)"""
     return crud.update_post(db, current_user, post_id, post_update)
+
+
+# ✅ Підписка на користувача / скасування підписки
+@router.post("/users/{user_id}/follow/")
+def follow_user(
+        user_id: int,
+        db: Session = Depends(database.get_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    return feed.follow(db, current_user.id, user_id)
+
+
+@router.delete("/users/{user_id}/follow/")
+def unfollow_user(
+        user_id: int,
+        db: Session = Depends(database.get_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    return feed.unfollow(db, current_user.id, user_id)
+
+
+# ✅ Стрічка: найновіші пости авторів, на яких підписаний користувач (курсор у X-Next-Cursor)
+@router.get("/feed/", response_model=list[schemas.PostResponse])
+def get_feed(
+        response: Response,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        db: Session = Depends(replicas.get_read_db),
+        primary: Session = Depends(database.get_db),  # Побудова кешованої стрічки — лише з основної БД
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    posts, next_cursor = feed.get_feed(db, current_user.id, cursor, limit, primary)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return posts
+
+
+# ✅ Масовий імпорт / експорт (NDJSON або CSV), лише для адміністраторів; у обох режимах БД
+bulk_router = APIRouter(prefix="/bulk", dependencies=[Depends(auth.require_admin)])
+
+
+def _bulk_format(request: Request, format: str = None) -> str:
+    fmt = format or ("csv" if "csv" in request.headers.get("content-type", "") else "ndjson")
+    if fmt not in bulk.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Непідтримуваний формат: {fmt}")
+    return fmt
+
+
+def _bulk_export(kind: str, fmt: str, user_id: int = None):
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(bulk.export_lines(kind, fmt, user_id), media_type=media_type)
+
+
+@bulk_router.post("/users/import")
+async def bulk_import_users(request: Request, fmt: str = Depends(_bulk_format)):
+    """Імпорт користувачів: email, full_name, password або password_hash"""
+    return await bulk.import_stream("users", request.stream(), fmt)
+
+
+@bulk_router.post("/posts/import")
+async def bulk_import_posts(request: Request, fmt: str = Depends(_bulk_format)):
+    """Імпорт постів: user_id, text, created_at, updated_at"""
+    return await bulk.import_stream("posts", request.stream(), fmt)
+
+
+@bulk_router.get("/users/export")
+def bulk_export_users(fmt: str = Depends(_bulk_format)):
+    return _bulk_export("users", fmt)
+
+
+@bulk_router.get("/posts/export")
+def bulk_export_posts(user_id: int = None, fmt: str = Depends(_bulk_format)):
+    return _bulk_export("posts", fmt, user_id)
+
+
+app.include_router(routes_async.router if database.DB_MODE == "async" else router)
+app.include_router(bulk_router)
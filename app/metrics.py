@@ -0,0 +1,426 @@
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger("app.slow_requests")
+
+# Server-Timing у відповідях (зручно в DevTools) та журнал повільних запитів
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", 1.0))  # 0 — вимкнено
+# Кілька процесів (gunicorn): кожен воркер скидає свої метрики у файл цього каталогу,
+# а /metrics будь-якого воркера віддає суму по всіх (аналог PROMETHEUS_MULTIPROC_DIR)
+METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR") or None
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", 1.0))
+
+# Межі кошиків у секундах (від 1 мс до 10 с)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Гістограма значень з фіксованими кошиками (накопичувальні лічильники)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, buckets = 0, {}
+            for bound, count in zip(self.buckets, self._counts):
+                cumulative += count
+                buckets[str(bound)] = cumulative
+            buckets["+Inf"] = self._count
+            return {"buckets": buckets, "sum": round(self._sum, 6), "count": self._count}
+
+    def raw(self):
+        with self._lock:
+            return [list(self._counts), self._sum, self._count]
+
+
+class Family:
+    """Метрика з мітками: окремий Histogram або лічильник на кожен набір значень міток"""
+
+    def __init__(self, name: str, kind: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.kind = kind  # counter | histogram
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _child(self, values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == "histogram" else [0]
+                    self._children[values] = child
+        return child
+
+    def observe(self, value: float, *label_values):
+        self._child(label_values).observe(value)
+
+    def inc(self, *label_values, amount: float = 1):
+        child = self._child(label_values)
+        with self._lock:
+            child[0] += amount
+
+    def state(self):
+        """Сирі значення по наборах міток (лічильник — число, гістограма — [кошики, сума, кількість])"""
+        with self._lock:
+            children = list(self._children.items())
+        return {values: child[0] if self.kind == "counter" else child.raw() for values, child in children}
+
+    def reset(self):
+        with self._lock:
+            self._children.clear()
+
+
+def _render_family(name, kind, help_text, labels, buckets, children):
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for values, value in sorted(children.items()):
+        label_pairs = _labels(zip(labels, values))
+        if kind == "counter":
+            lines.append(f"{name}{_braces(label_pairs)} {_number(value)}")
+            continue
+        counts, total, count = value
+        cumulative = 0
+        for bound, bucket in zip(buckets, counts):
+            cumulative += bucket
+            lines.append(f"{name}_bucket{_braces(label_pairs + _labels([('le', bound)]))} {cumulative}")
+        lines.append(f"{name}_bucket{_braces(label_pairs + _labels([('le', '+Inf')]))} {count}")
+        lines.append(f"{name}_sum{_braces(label_pairs)} {_number(round(total, 6))}")
+        lines.append(f"{name}_count{_braces(label_pairs)} {count}")
+    return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs):
+    return [f'{name}="{_escape(value)}"' for name, value in pairs]
+
+
+def _braces(labels) -> str:
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+families = {}
+collectors = []  # Функції, що повертають [(name, help, {labels}, value)] для gauge-метрик
+
+
+def counter(name: str, help_text: str, labels=()) -> Family:
+    return families.setdefault(name, Family(name, "counter", help_text, labels))
+
+
+def histogram(name: str, help_text: str, labels=(), buckets=DEFAULT_BUCKETS) -> Family:
+    return families.setdefault(name, Family(name, "histogram", help_text, labels, buckets))
+
+
+request_latency = histogram("http_request_duration_seconds", "Тривалість HTTP-запиту", ("method", "route", "status"))
+db_queries = counter("db_queries_total", "Кількість SQL-запитів", ("route",))
+db_query_time = histogram("db_query_duration_seconds", "Тривалість SQL-запиту", ("route",))
+operation_time = histogram("app_operation_duration_seconds", "Тривалість операцій застосунку", ("operation",))
+
+# Статистика поточного запиту (запити до БД, таймери) для Server-Timing і журналу повільних запитів
+_request = contextvars.ContextVar("request_metrics", default=None)
+
+
+def _current_route() -> str:
+    stats = _request.get()
+    return _route_template(stats["scope"]) if stats else "background"
+
+
+@contextmanager
+def timer(operation: str):
+    """Вимір тривалості операції (bcrypt, JWT, серіалізація)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        operation_time.observe(elapsed, operation)
+        stats = _request.get()
+        if stats is not None:
+            stats["timings"][operation] = stats["timings"].get(operation, 0.0) + elapsed
+
+
+def instrument_engine(engine):
+    """Хуки SQLAlchemy: кількість і час SQL-запитів, у т.ч. в межах HTTP-запиту"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        route = _current_route()
+        db_queries.inc(route)
+        db_query_time.observe(elapsed, route)
+        stats = _request.get()
+        if stats is not None:
+            stats["db_count"] += 1
+            stats["db_time"] += elapsed
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: гістограма затримок по шаблону маршруту, Server-Timing, повільні запити"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        # Маршрут стає відомим після маршрутизації (scope["route"]); SQL-хуки читають його зі scope
+        stats = {"scope": scope, "db_count": 0, "db_time": 0.0, "timings": {}}
+        token = _request.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if METRICS_SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(stats, time.perf_counter() - start).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request.reset(token)
+            elapsed = time.perf_counter() - start
+            route = _route_template(scope)
+            request_latency.observe(elapsed, scope["method"], route, str(status["code"]))
+            if SLOW_REQUEST_SECONDS and elapsed >= SLOW_REQUEST_SECONDS:
+                logger.warning("Повільний запит %s %s: %.3f с, SQL: %d за %.3f с, %s",
+                               scope["method"], scope["path"], elapsed, stats["db_count"], stats["db_time"],
+                               {name: round(value, 4) for name, value in stats["timings"].items()})
+
+
+def _server_timing(stats, elapsed: float) -> str:
+    parts = [f'db;dur={stats["db_time"] * 1000:.2f};desc="{stats["db_count"]} queries"']
+    parts += [f"{name};dur={value * 1000:.2f}" for name, value in stats["timings"].items()]
+    parts.append(f"app;dur={elapsed * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def instrument_serialization():
+    """Таймер навколо серіалізації response_model у FastAPI.
+
+    FastAPI не має хука для цього етапу, тому обгортається fastapi.routing.serialize_response
+    (викликається за іменем модуля під час кожного запиту).
+    """
+    import fastapi.routing
+
+    original = fastapi.routing.serialize_response
+    if getattr(original, "instrumented", False):
+        return
+
+    async def serialize_response(*args, **kwargs):
+        with timer("serialize"):
+            return await original(*args, **kwargs)
+
+    serialize_response.instrumented = True
+    fastapi.routing.serialize_response = serialize_response
+
+
+def _collect_gauges():
+    return [(name, help_text, labels, value) for collect in collectors
+            for name, help_text, labels, value in collect()]
+
+
+def _render(family_states, gauge_samples) -> str:
+    lines = []
+    for name, (kind, help_text, labels, buckets, children) in family_states.items():
+        lines.extend(_render_family(name, kind, help_text, labels, buckets, children))
+    gauges = {}
+    for name, help_text, labels, value in gauge_samples:
+        gauges.setdefault((name, help_text), []).append((labels, value))
+    for (name, help_text), samples in gauges.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for labels, value in samples:
+            lines.append(f"{name}{_braces(_labels(sorted(labels.items())))} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def render() -> str:
+    """Усі метрики у текстовому форматі Prometheus (з METRICS_MULTIPROC_DIR — сума по воркерах)"""
+    if METRICS_MULTIPROC_DIR:
+        flush()
+        return _render_multiprocess()
+    states = {family.name: (family.kind, family.help, family.labels, family.buckets, family.state())
+              for family in list(families.values())}
+    return _render(states, _collect_gauges())
+
+
+# --- Режим кількох процесів ---
+# Файл воркера: metrics_<pid>.json, перезаписується раз на METRICS_FLUSH_SECONDS і при кожному
+# /metrics. Лічильники і гістограми завершених воркерів майстер дописує в metrics_dead.json
+# (mark_process_dead), тож сума не зменшується після перезапуску воркера; gauge-метрики
+# належать живому процесу і мають мітку worker.
+
+_flusher = None
+_flusher_stop = threading.Event()
+
+
+def _path(name) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f"metrics_{name}.json")
+
+
+def _dump_families(states):
+    return {name: {"kind": kind, "help": help_text, "labels": list(labels), "buckets": list(buckets),
+                   "children": [[list(values), value] for values, value in children.items()]}
+            for name, (kind, help_text, labels, buckets, children) in states.items()}
+
+
+def _write(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)  # Атомарно: читач бачить або старий, або новий файл
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _merge(total, dumped):
+    """Додавання лічильників і кошиків гістограм з файлу до total: name -> (kind, ..., children)"""
+    for name, family in dumped.items():
+        _, _, _, _, children = total.setdefault(
+            name, (family["kind"], family["help"], tuple(family["labels"]), tuple(family["buckets"]), {}))
+        for values, value in family["children"]:
+            values = tuple(values)
+            current = children.get(values)
+            if current is None:
+                children[values] = value
+            elif family["kind"] == "counter":
+                children[values] = current + value
+            else:
+                children[values] = [[a + b for a, b in zip(current[0], value[0])],
+                                    current[1] + value[1], current[2] + value[2]]
+
+
+def flush():
+    """Запис метрик поточного процесу у його файл"""
+    states = {family.name: (family.kind, family.help, family.labels, family.buckets, family.state())
+              for family in list(families.values())}
+    gauges = [[name, help_text, {**labels, "worker": str(os.getpid())}, value]
+              for name, help_text, labels, value in _collect_gauges()]
+    _write(_path(os.getpid()), {"families": _dump_families(states), "gauges": gauges})
+
+
+def _render_multiprocess() -> str:
+    total, gauges = {}, []
+    for path in sorted(glob.glob(_path("*"))):
+        data = _read(path)
+        if data is None:
+            continue
+        _merge(total, data["families"])
+        gauges += [tuple(sample) for sample in data.get("gauges", ())]
+    return _render(total, gauges)
+
+
+def _flush_loop():
+    while not _flusher_stop.wait(METRICS_FLUSH_SECONDS):
+        try:
+            flush()
+        except OSError:
+            logger.exception("Не вдалося записати метрики у %s", METRICS_MULTIPROC_DIR)
+
+
+def start_multiprocess():
+    """Періодичний запис метрик воркера (викликається у воркері при старті)"""
+    global _flusher
+    if not METRICS_MULTIPROC_DIR or _flusher is not None:
+        return
+    _flusher_stop.clear()
+    _flusher = threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True)
+    _flusher.start()
+
+
+def stop_multiprocess():
+    """Останній запис перед завершенням воркера"""
+    global _flusher
+    if _flusher is None:
+        return
+    _flusher_stop.set()
+    _flusher.join()
+    _flusher = None
+    flush()
+
+
+def reset_after_fork():
+    """Значення, накопичені в майстрі до fork (preload_app), не належать воркеру"""
+    global _flusher
+    _flusher = None
+    for family in list(families.values()):
+        family.reset()
+
+
+def mark_process_dead(pid: int):
+    """Перенесення лічильників завершеного воркера в metrics_dead.json (gunicorn child_exit, у майстрі)"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    data = _read(_path(pid))
+    if data is not None:
+        dead = {}
+        _merge(dead, (_read(_path("dead")) or {}).get("families", {}))
+        _merge(dead, data["families"])
+        _write(_path("dead"), {"families": _dump_families(dead), "gauges": []})
+    try:
+        os.remove(_path(pid))
+    except FileNotFoundError:
+        pass
+
+
+def clear_multiprocess_dir():
+    """Очищення каталогу перед стартом сервера: файли попереднього запуску не сумуються"""
+    if not METRICS_MULTIPROC_DIR:
+        return
+    os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+    for path in glob.glob(_path("*")):
+        os.remove(path)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 import datetime
@@ -13,10 +13,19 @@ class User(Base):
     full_name = Column(String(100), nullable=True)
     last_login = Column(DateTime, nullable=True)
     last_logout = Column(DateTime, nullable=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Зростає при зміні пароля
 
     # Зв'язок один-до-багатьох (User → Posts)
     posts = relationship("Post", back_populates="owner")
 
+    # Повнотекстові індекси для пошуку підрядка (лише MySQL, парсер ngram)
+    __table_args__ = (
+        Index("ix_users_email_ft", "email", mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+        Index("ix_users_full_name_ft", "full_name", mysql_prefix="FULLTEXT", mysql_with_parser="ngram").ddl_if(dialect="mysql"),
+        # "Активні з" і сортування за last_login (з id для стабільного keyset-порядку)
+        Index("ix_users_last_login_id", "last_login", "id"),
+    )
+
 
 class Post(Base):
     __tablename__ = "posts"
@@ -29,3 +38,21 @@ class Post(Base):
 
     # Визначаємо зворотний зв'язок із користувачем
     owner = relationship("User", back_populates="posts")
+
+    # Стрічка постів користувача від найновіших: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+class Follow(Base):
+    __tablename__ = "follows"
+
+    follower_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # Хто підписався
+    followee_id = Column(Integer, ForeignKey("users.id"), primary_key=True)  # На кого
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    # Підписники автора (розсилка нового поста у кешовані стрічки)
+    __table_args__ = (
+        Index("ix_follows_followee_id", "followee_id"),
+    )
@@ -0,0 +1,117 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+from . import database, fastjson
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(*values) -> str:
+    """Кодування ключа останнього рядка сторінки у непрозорий токен"""
+    raw = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    data = json.dumps(raw, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str], size: int):
+    """Розбір токена курсора; повертає None, якщо курсор не передано"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError
+        return values
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некоректний курсор")
+
+
+def decode_id_cursor(cursor: Optional[str]) -> Optional[int]:
+    """Курсор за id (список користувачів)"""
+    values = decode_cursor(cursor, 1)
+    if values is None:
+        return None
+    if not isinstance(values[0], int):
+        raise HTTPException(status_code=400, detail="Некоректний курсор")
+    return values[0]
+
+
+def decode_time_id_cursor(cursor: Optional[str]):
+    """Курсор за (created_at, id) (стрічка постів)"""
+    values = decode_cursor(cursor, 2)
+    if values is None:
+        return None
+    try:
+        return datetime.fromisoformat(values[0]), int(values[1])
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Некоректний курсор")
+
+
+def decode_sort_cursor(cursor: Optional[str], sort: str, size: int):
+    """Курсор з назвою сортування першим елементом; курсор іншого сортування — 400"""
+    values = decode_cursor(cursor, size + 1)
+    if values is None:
+        return None
+    if values[0] != sort:
+        raise HTTPException(status_code=400, detail="Курсор не відповідає сортуванню")
+    return values[1:]
+
+
+def split_page(rows, limit: int, key):
+    """Відрізає зайвий (limit+1)-й рядок; повертає (rows, next_cursor)"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
+
+
+def user_key(user):
+    return (user.id,)
+
+
+def post_key(post):
+    return post.created_at, post.id
+
+
+def ndjson_response(rows, schema, fields=None):
+    """Потокова NDJSON-відповідь; rows(db) повертає ітератор ORM-об'єктів
+    (або рядків-кортежів колонок fields — тоді без Pydantic, через fastjson).
+
+    Сесія відкривається всередині генератора, бо тіло віддається вже після
+    завершення залежностей маршруту.
+    """
+    def generate():
+        db = database.open_session()
+        try:
+            for row in rows(db):
+                if fields:
+                    yield fastjson.dump_line(row, fields)
+                else:
+                    yield schema.model_validate(row).model_dump_json() + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+def ndjson_response_async(statement, schema, chunk_size: int = 1000, fields=None):
+    """Потокова NDJSON-відповідь для async-режиму (AsyncSession.stream_scalars / stream)"""
+    async def generate():
+        async with database.open_async_session() as db:
+            statement_ = statement.execution_options(yield_per=chunk_size)
+            if fields:
+                async for row in await db.stream(statement_):
+                    yield fastjson.dump_line(row, fields)
+                return
+            result = await db.stream_scalars(statement_)
+            async for row in result:
+                yield schema.model_validate(row).model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
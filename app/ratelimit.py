@@ -0,0 +1,186 @@
+"""Обмеження спроб входу: ковзне вікно за IP і за акаунтом.
+
+Перевірка виконується до звернення до БД і bcrypt, тож хвиля підбору паролів
+відсікається відповіддю 429 замість того, щоб завантажити пул хешування.
+За IP (LOGIN_IP_LIMIT за LOGIN_IP_WINDOW секунд) і за акаунтом (LOGIN_ACCOUNT_LIMIT
+за LOGIN_ACCOUNT_WINDOW) спроба резервується атомарним incr ще до bcrypt, тож одночасні
+спроби не проскакують ліміт; успішний вхід скидає лічильник акаунта, і в ньому
+лишаються лише невдалі спроби. Ліміт 0 вимикає відповідну перевірку.
+
+Лічильники зберігаються у сховищі з інтерфейсом incr / get / delete: у пам'яті
+процесу або (CACHE_BACKEND=redis) у Redis, спільно для всіх воркерів;
+set_store() дозволяє підставити власне сховище.
+"""
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+from . import cache, metrics
+
+load_dotenv()
+
+LOGIN_IP_LIMIT = int(os.getenv("LOGIN_IP_LIMIT", 100))
+LOGIN_IP_WINDOW = float(os.getenv("LOGIN_IP_WINDOW", 60))
+LOGIN_ACCOUNT_LIMIT = int(os.getenv("LOGIN_ACCOUNT_LIMIT", 10))
+LOGIN_ACCOUNT_WINDOW = float(os.getenv("LOGIN_ACCOUNT_WINDOW", 900))
+RATE_LIMIT_STORE_SIZE = int(os.getenv("RATE_LIMIT_STORE_SIZE", 100000))
+# Брати IP клієнта з X-Forwarded-For (останній запис додає наш проксі); лише за довіреним проксі
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+
+login_rejected = metrics.counter("login_rejected_total", "Відхилені спроби входу", ("reason",))
+
+
+class MemoryStore:
+    """Лічильники з TTL у пам'яті процесу (обмежена кількість ключів, найстаріші витісняються)"""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, count)
+        self._lock = threading.Lock()
+
+    def incr(self, key: str, ttl: float) -> int:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < now:
+                item = (now + ttl, 0)
+            item = (item[0], item[1] + 1)
+            self._data[key] = item
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            return item[1]
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                return 0
+            return item[1]
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisStore:
+    """Лічильники в Redis (INCR + EXPIRE NX), спільні для всіх воркерів і вузлів"""
+
+    def __init__(self, client, namespace: str = "ratelimit"):
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def incr(self, key: str, ttl: float) -> int:
+        # INCR і EXPIRE NX в одній транзакції (MULTI / EXEC, Redis >= 7): лічильник не
+        # лишиться без TTL, якщо процес впаде між командами
+        pipe = self.client.pipeline()
+        pipe.incr(self._key(key))
+        pipe.expire(self._key(key), max(1, math.ceil(ttl)), nx=True)
+        value, _ = pipe.execute()
+        return value
+
+    def get(self, key: str) -> int:
+        return int(self.client.get(self._key(key)) or 0)
+
+    def delete(self, key: str):
+        self.client.delete(self._key(key))
+
+
+class SlidingWindowLimiter:
+    """Ковзне вікно з двох фіксованих: попереднє вікно враховується пропорційно часу, що лишився"""
+
+    def __init__(self, name: str, limit: int, window: float, store):
+        self.name = name
+        self.limit = limit
+        self.window = window
+        self.store = store
+
+    def _slots(self, key: str, now: float):
+        index = int(now // self.window)
+        elapsed = (now % self.window) / self.window
+        return f"{self.name}:{key}:{index}", f"{self.name}:{key}:{index - 1}", elapsed
+
+    def acquire(self, key: str) -> int:
+        """Резервує спробу (incr) і повертає 0, якщо з нею ліміт не перевищено, інакше — через
+        скільки секунд повторити. Лічильник збільшується до перевірки, тож одночасні спроби
+        не проходять перевірку всі разом"""
+        if self.limit <= 0:
+            return 0
+        now = time.time()
+        current, previous, elapsed = self._slots(key, now)
+        taken = self.store.incr(current, self.window * 2)  # Потрібне ще й як попереднє вікно
+        if self.store.get(previous) * (1 - elapsed) + taken <= self.limit:
+            return 0
+        return max(1, math.ceil(self.window - now % self.window))
+
+    def reset(self, key: str):
+        if self.limit > 0:
+            current, previous, _ = self._slots(key, time.time())
+            self.store.delete(current)
+            self.store.delete(previous)
+
+
+def make_store():
+    if cache.CACHE_BACKEND == "memory":
+        return MemoryStore(RATE_LIMIT_STORE_SIZE)
+    return RedisStore(cache.get_redis_client())
+
+
+_store = make_store()
+ip_limiter = SlidingWindowLimiter("login_ip", LOGIN_IP_LIMIT, LOGIN_IP_WINDOW, _store)
+account_limiter = SlidingWindowLimiter("login_account", LOGIN_ACCOUNT_LIMIT, LOGIN_ACCOUNT_WINDOW, _store)
+
+
+def set_store(store):
+    """Інше сховище лічильників (будь-який об'єкт з incr(key, ttl) / get(key) / delete(key))"""
+    ip_limiter.store = store
+    account_limiter.store = store
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _account_key(email: str) -> str:
+    return (email or "").strip().lower()[:254]
+
+
+def _reject(reason: str, retry_after: int):
+    login_rejected.inc(reason)
+    raise HTTPException(
+        status_code=429,
+        detail="Забагато спроб входу, спробуйте пізніше",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+def check_login(request: Request, email: str):
+    """Перед пошуком користувача і bcrypt резервує спробу за IP і за акаунтом; 429, якщо ліміт вичерпано"""
+    retry_after = ip_limiter.acquire(client_ip(request))
+    if retry_after:
+        _reject("ip_limit", retry_after)
+    retry_after = account_limiter.acquire(_account_key(email))
+    if retry_after:
+        _reject("account_limit", retry_after)
+
+
+def login_failed(email: str, reason: str):
+    """Невдала спроба (unknown_user / bad_password): у ліміті акаунта її вже враховано в check_login"""
+    login_rejected.inc(reason)
+
+
+def login_succeeded(email: str):
+    """Успішний вхід скидає лічильник акаунта разом із зарезервованою спробою"""
+    account_limiter.reset(_account_key(email))
@@ -0,0 +1,295 @@
+"""Маршрутизація читань на репліки БД.
+
+Залежності get_read_db / get_read_async_db віддають сесію однієї зі здорових реплік
+(round_robin або least_loaded — найменше відкритих сесій), а якщо реплік немає, усі
+недоступні чи читач нещодавно писав — сесію основної БД. Після commit, що змінив
+користувача, його пости чи підписки, цей користувач REPLICA_STICKY_SECONDS читає
+з основної БД (read-your-writes): і як автор запиту (uid у токені), і як предмет
+запиту (user_id у шляху).
+
+Локально — дві копії SQLite-бази:
+    cp app.db replica1.db && cp app.db replica2.db
+    DATABASE_REPLICA_URLS=sqlite:///./replica1.db,sqlite:///./replica2.db uvicorn app.main:app
+"""
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from fastapi import Depends, Request
+from sqlalchemy import event, exc, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import cache, database, metrics, models, tokens
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+REPLICA_STRATEGY = os.getenv("REPLICA_STRATEGY", "round_robin")  # round_robin | least_loaded
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))  # Читання з основної БД після запису
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", 5))  # Період активної перевірки
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", 10))  # Пауза після збою репліки
+STICKY_CACHE_SIZE = int(os.getenv("STICKY_CACHE_SIZE", 100000))
+
+# "<user_id>" -> 1, поки дані користувача могли ще не дійти до реплік
+recent_writers = cache.make_cache("sticky", STICKY_CACHE_SIZE, REPLICA_STICKY_SECONDS)
+
+reads = metrics.counter("db_read_routing_total", "Куди направлено читання", ("target",))
+
+
+class Replica:
+    """Репліка: ліниві engine, лічильник відкритих сесій і стан здоров'я"""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.healthy = True
+        self.retry_at = 0.0
+        self.failures = 0
+        self.in_flight = 0
+        self._engine = None
+        self._async_engine = None
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._engine = database.make_engine(self.url)
+        return self._engine
+
+    @property
+    def async_engine(self):
+        if self._async_engine is None:
+            with self._lock:
+                if self._async_engine is None:
+                    self._async_engine = database.make_async_engine(database.async_url(self.url))
+        return self._async_engine
+
+    def available(self, now: float) -> bool:
+        # Після паузи репліка знову отримує запити; перший успішний повертає її в ротацію
+        return self.healthy or now >= self.retry_at
+
+    def enter(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def mark_up(self):
+        if not self.healthy:
+            logger.warning("Репліка %s знову доступна", self.name)
+        self.healthy = True
+
+    def mark_down(self, error):
+        if self.healthy:
+            logger.warning("Репліка %s недоступна: %s", self.name, error)
+        self.healthy = False
+        with self._lock:
+            self.failures += 1
+        self.retry_at = time.monotonic() + REPLICA_RETRY_SECONDS
+
+    def ping(self):
+        with self.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+    async def aping(self):
+        async with self.async_engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    def stats(self):
+        return {"healthy": self.healthy, "in_flight": self.in_flight, "failures": self.failures}
+
+    def reset_after_fork(self):
+        if self._engine is not None:
+            self._engine.dispose(close=False)
+        if self._async_engine is not None:
+            self._async_engine.sync_engine.dispose(close=False)
+
+    async def dispose(self):
+        if self._engine is not None:
+            self._engine.dispose()
+        if self._async_engine is not None:
+            await self._async_engine.dispose()
+
+
+replicas = [Replica(f"replica{i}", url) for i, url in enumerate(REPLICA_URLS, start=1)]
+_rotation = itertools.count()
+
+
+def _choose():
+    now = time.monotonic()
+    candidates = [replica for replica in replicas if replica.available(now)]
+    if not candidates:
+        return None
+    start = next(_rotation)
+    if REPLICA_STRATEGY == "least_loaded":
+        # Найменше відкритих сесій; за рівності — по колу, щоб не вантажити першу
+        return min(candidates[start % len(candidates):] + candidates[:start % len(candidates)],
+                   key=lambda replica: replica.in_flight)
+    return candidates[start % len(candidates)]
+
+
+def _reader_ids(request: Request):
+    """Користувачі, чиї свіжі записи має бачити цей запит: автор (uid у токені) і user_id у шляху"""
+    user_id = request.path_params.get("user_id")
+    if user_id is not None:
+        yield str(user_id)
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            uid = tokens.verify(authorization[7:]).get("uid")
+        except tokens.TokenError:
+            return  # Недійсний токен відхилить сама авторизація маршруту
+        if uid is not None:
+            yield str(uid)
+
+
+def pick(request: Request):
+    """Репліка для читання або None — читати з основної БД"""
+    if not replicas:
+        return None
+    if any(recent_writers.get(user_id) is not None for user_id in _reader_ids(request)):
+        reads.inc("primary")
+        return None
+    replica = _choose()
+    reads.inc(replica.name if replica is not None else "primary")
+    return replica
+
+
+def _is_connection_error(error) -> bool:
+    return isinstance(error, exc.DBAPIError) and (
+        error.connection_invalidated or isinstance(error, (exc.OperationalError, exc.InterfaceError))
+    )
+
+
+def get_read_db(request: Request, db: Session = Depends(database.get_db)):
+    """Сесія для маршрутів лише на читання (без реплік — та сама сесія, що й database.get_db)"""
+    replica = pick(request)
+    if replica is None:
+        yield db
+        return
+    session = database.SessionLocal(bind=replica.engine)
+    replica.enter()
+    try:
+        yield session
+    except Exception as e:
+        if _is_connection_error(e):
+            replica.mark_down(e)
+        raise
+    else:
+        replica.mark_up()
+    finally:
+        replica.leave()
+        session.close()
+
+
+async def get_read_async_db(request: Request, db: AsyncSession = Depends(database.get_async_db)):
+    replica = await asyncio.to_thread(pick, request) if replicas else None  # pick читає Redis
+    if replica is None:
+        yield db
+        return
+    replica.enter()
+    try:
+        async with database.AsyncSessionLocal(bind=replica.async_engine) as session:
+            yield session
+    except Exception as e:
+        if _is_connection_error(e):
+            replica.mark_down(e)
+        raise
+    else:
+        replica.mark_up()
+    finally:
+        replica.leave()
+
+
+# Read-your-writes: власники змінених рядків запам'ятовуються при flush і позначаються після commit
+def _owner_id(obj):
+    if isinstance(obj, models.User):
+        return obj.id
+    if isinstance(obj, models.Post):
+        return obj.user_id
+    if isinstance(obj, models.Follow):
+        return obj.follower_id
+    return None
+
+
+def _after_flush(session, flush_context):
+    owners = session.info.setdefault("written_users", set())
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        owner_id = _owner_id(obj)
+        if owner_id is not None:
+            owners.add(owner_id)
+
+
+def _after_commit(session):
+    for user_id in session.info.pop("written_users", ()):
+        mark_written(user_id)
+
+
+def _after_rollback(session):
+    session.info.pop("written_users", None)
+
+
+def mark_written(user_id: int):
+    """Користувач щойно писав: його читання йдуть в основну БД, поки репліки наздоганяють"""
+    recent_writers.set(str(user_id), 1)
+
+
+if replicas:
+    event.listen(Session, "after_flush", _after_flush)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_rollback", _after_rollback)
+
+
+async def check_health():
+    """Активна перевірка всіх реплік (SELECT 1 з таймаутом DB_READY_TIMEOUT)"""
+    for replica in replicas:
+        try:
+            if database.DB_MODE == "async":
+                await asyncio.wait_for(replica.aping(), database.DB_READY_TIMEOUT)
+            else:
+                await asyncio.wait_for(asyncio.to_thread(replica.ping), database.DB_READY_TIMEOUT)
+        except Exception as e:
+            replica.mark_down(e)
+        else:
+            replica.mark_up()
+
+
+async def monitor():
+    """Фонова перевірка реплік кожні REPLICA_HEALTH_INTERVAL секунд (запускається в lifespan)"""
+    while True:
+        await check_health()
+        await asyncio.sleep(REPLICA_HEALTH_INTERVAL)
+
+
+def stats():
+    return {replica.name: replica.stats() for replica in replicas}
+
+
+def _replica_gauges():
+    for replica in replicas:
+        yield "app_db_replica_up", "Репліка в ротації", {"replica": replica.name}, int(replica.healthy)
+        yield "app_db_replica_in_flight", "Відкриті сесії репліки", {"replica": replica.name}, replica.in_flight
+
+
+metrics.collectors.append(_replica_gauges)
+
+
+def reset_after_fork():
+    for replica in replicas:
+        replica.reset_after_fork()
+
+
+async def dispose():
+    for replica in replicas:
+        await replica.dispose()
@@ -0,0 +1,82 @@
+"""Кеш відповідей GET /users/{user_id}/posts/ з ETag / Last-Modified"""
+import hashlib
+import json
+import os
+from datetime import timezone
+from email.utils import format_datetime
+
+from dotenv import load_dotenv
+from fastapi import Request, Response
+
+from . import cache, fastjson, schemas
+
+load_dotenv()
+
+POSTS_CACHE_SIZE = int(os.getenv("POSTS_CACHE_SIZE", 10000))
+POSTS_CACHE_TTL = float(os.getenv("POSTS_CACHE_TTL", 300))
+
+# "<user_id>:<cursor>:<limit>" -> готове тіло відповіді та заголовки валідації
+posts_cache = cache.make_cache("posts", POSTS_CACHE_SIZE, POSTS_CACHE_TTL, grouped=True)
+
+
+def _key(user_id: int, cursor: str, limit: int) -> str:
+    return f"{user_id}:{cursor or ''}:{limit}"
+
+
+def get_posts(user_id: int, cursor: str, limit: int):
+    """(entry | None, покоління) — покоління читається до запиту до БД і передається в store_posts"""
+    return posts_cache.get_with_generation(_key(user_id, cursor, limit))
+
+
+def store_posts(user_id: int, cursor: str, limit: int, posts, next_cursor: str = None,
+                generation=cache.CURRENT) -> dict:
+    """Серіалізація сторінки постів один раз і збереження її в кеші.
+
+    posts — ORM-об'єкти або рядки-кортежі fastjson.POST_COLUMNS (FAST_JSON=true).
+    Якщо після get_posts сторінки користувача скинули, застарілий результат не буде віддано з кешу.
+    """
+    if fastjson.FAST_JSON:
+        body = fastjson.dump_rows(posts, fastjson.POST_FIELDS).decode()
+    else:
+        items = [schemas.PostResponse.model_validate(post).model_dump(mode="json") for post in posts]
+        body = json.dumps(items, ensure_ascii=False, separators=(",", ":"))
+    # ETag залежить від id та updated_at кожного поста сторінки (зміна, видалення, новий пост)
+    version = ",".join(f"{post.id}:{post.updated_at}" for post in posts)
+    entry = {
+        "body": body,
+        "etag": '"' + hashlib.sha1(version.encode()).hexdigest() + '"',
+        "last_modified": None,
+        "next_cursor": next_cursor,
+    }
+    stamps = [post.updated_at for post in posts if post.updated_at is not None]
+    if stamps:
+        last_modified = max(stamps).replace(tzinfo=timezone.utc)
+        entry["last_modified"] = format_datetime(last_modified, usegmt=True)
+    posts_cache.set(_key(user_id, cursor, limit), entry, generation=generation)
+    return entry
+
+
+def invalidate_user(user_id: int):
+    """Скидання всіх сторінок постів користувача (створення, редагування, видалення)"""
+    posts_cache.delete_prefix(f"{user_id}:")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+def respond(request: Request, entry: dict) -> Response:
+    """200 з тілом з кешу або 304, якщо клієнт уже має цю версію"""
+    headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+    if entry["last_modified"]:
+        headers["Last-Modified"] = entry["last_modified"]
+    if entry["next_cursor"]:
+        headers["X-Next-Cursor"] = entry["next_cursor"]
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
@@ -0,0 +1,255 @@
+"""Маршрути async-режиму (DB_MODE=async): ті самі шляхи, що й у main.py, на AsyncSession.
+
+Звернення до кешів і лічильників (з CACHE_BACKEND=redis — мережеві виклики redis-py)
+виконуються через asyncio.to_thread, щоб не блокувати цикл подій.
+"""
+import asyncio
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from . import models, schemas, database, crud, crud_async, auth, pagination, search, cache, hashing, response_cache, write_behind, tokens, feed, fastjson, replicas, ratelimit
+
+router = APIRouter()
+
+
+@router.post("/register/", response_model=schemas.UserResponse)
+async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(database.get_async_db)):
+    db_user = await crud_async.get_user_by_email(db, user.email)
+    if db_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    return await crud_async.create_user(db, user)
+
+
+@router.post("/login/", response_model=schemas.Token)
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends(),
+                     db: AsyncSession = Depends(database.get_async_db)):
+    await asyncio.to_thread(ratelimit.check_login, request, form_data.username)
+    user = await crud_async.get_user_by_email(db, form_data.username)
+    if not user:
+        await hashing.averify_and_update(form_data.password, hashing.dummy_hash())
+        await asyncio.to_thread(ratelimit.login_failed, form_data.username, "unknown_user")
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    verified, new_hash = await hashing.averify_and_update(form_data.password, user.password)
+    if not verified:
+        await asyncio.to_thread(ratelimit.login_failed, form_data.username, "bad_password")
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    await asyncio.to_thread(ratelimit.login_succeeded, form_data.username)
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
+
+    access_token = auth.create_access_token(data=auth.token_claims(user))
+    await crud_async.update_last_login(db, user)
+
+    return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.delete("/users/me/", status_code=204)
+async def delete_current_user(
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: models.User = Depends(auth.get_current_user_async)
+):
+    await db.run_sync(feed.remove_user, current_user.id)
+    await db.delete(current_user)
+    await db.commit()
+    search.remove_user(current_user.id)
+    await asyncio.to_thread(auth.invalidate_principal, current_user.email)
+    await asyncio.to_thread(tokens.revoke_user, current_user.id)
+    await asyncio.to_thread(response_cache.invalidate_user, current_user.id)
+    return {"message": "User deleted successfully"}
+
+
+@router.put("/users/me/", response_model=schemas.UserResponse)
+async def update_current_user(
+        user_update: schemas.UserUpdate,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: models.User = Depends(auth.get_current_user_async),
+):
+    updated_user = await crud_async.update_user(db, current_user, user_update)
+    await asyncio.to_thread(auth.invalidate_principal, updated_user.email)
+    return updated_user
+
+
+@router.post("/logout/", status_code=200)
+async def logout_user(db: AsyncSession = Depends(database.get_async_db),
+                      current_user: models.User = Depends(auth.get_current_user_async),
+                      identity: schemas.TokenData = Depends(auth.get_current_identity)):
+    await crud_async.update_last_logout(db, current_user)
+    await asyncio.to_thread(auth.invalidate_principal, current_user.email)
+    await asyncio.to_thread(auth.revoke_token, identity)
+    return {"message": "Logout successful"}
+
+
+@router.get("/cache/stats/")
+async def cache_stats(current_user: schemas.TokenData = Depends(auth.get_current_identity)):
+    return {**cache.stats(), "hashing": hashing.stats(), "db_pool": database.pool_stats(),
+            "write_behind": write_behind.stats()}
+
+
+@router.get("/users/", response_model=List[schemas.UserResponse])
+async def get_users(
+        response: Response,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        stream: bool = False,
+        db: AsyncSession = Depends(replicas.get_read_async_db),
+        current_user: models.User = Depends(auth.get_current_user_async)
+):
+    if stream:
+        if fastjson.FAST_JSON:
+            return pagination.ndjson_response_async(crud_async.users_statement(cursor, fastjson.USER_COLUMNS),
+                                                    schemas.UserResponse, fields=fastjson.USER_FIELDS)
+        return pagination.ndjson_response_async(crud_async.users_statement(cursor), schemas.UserResponse)
+
+    if fastjson.FAST_JSON:
+        rows, next_cursor = await crud_async.get_users_page(db, cursor, limit, fastjson.USER_COLUMNS)
+        return fastjson.rows_response(rows, fastjson.USER_FIELDS,
+                                      {"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+    users, next_cursor = await crud_async.get_users_page(db, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
+
+
+@router.get("/users/search/", response_model=schemas.UserResponse)
+async def search_user(
+        user_id: int = None,
+        email: str = None,
+        db: AsyncSession = Depends(replicas.get_read_async_db),
+        current_user: models.User = Depends(auth.get_current_user_async)
+):
+    if user_id:
+        user = await crud_async.get_user_by_id(db, user_id)
+    elif email:
+        user = await crud_async.get_user_by_email(db, email)
+    else:
+        raise HTTPException(status_code=400, detail="Необхідно вказати або ID, або Email")
+
+    if not user:
+        raise HTTPException(status_code=404, detail="Користувача не знайдено")
+
+    return user
+
+
+@router.get("/users/filter/", response_model=List[schemas.UserResponse])
+async def filter_users(
+        response: Response,
+        user_id: int = None,
+        email: str = None,
+        full_name: str = None,
+        last_login: datetime = None,
+        sort: str = Query(None, pattern=crud.USER_SORT_PATTERN),
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(replicas.get_read_async_db),
+        current_user: models.User = Depends(auth.get_current_user_async)
+):
+    users, next_cursor = await crud_async.filter_users(db, user_id, email, full_name, last_login, sort, cursor, limit)
+
+    if not users and cursor is None:
+        raise HTTPException(status_code=404, detail="Користувачів не знайдено")
+
+    response.headers["X-Has-More"] = "true" if next_cursor else "false"
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
+
+
+@router.get("/users/{user_id}/posts/", response_model=list[schemas.PostResponse])
+async def get_user_posts(
+        user_id: int,
+        request: Request,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        stream: bool = False,
+        db: AsyncSession = Depends(replicas.get_read_async_db)
+):
+    if stream:
+        if fastjson.FAST_JSON:
+            return pagination.ndjson_response_async(
+                crud_async.posts_by_user_statement(user_id, cursor, fastjson.POST_COLUMNS),
+                schemas.PostResponse, fields=fastjson.POST_FIELDS
+            )
+        return pagination.ndjson_response_async(
+            crud_async.posts_by_user_statement(user_id, cursor), schemas.PostResponse
+        )
+
+    entry, generation = await asyncio.to_thread(response_cache.get_posts, user_id, cursor, limit)
+    if entry is None:
+        columns = fastjson.POST_COLUMNS if fastjson.FAST_JSON else (models.Post,)
+        posts, next_cursor = await crud_async.get_posts_by_user(db, user_id, cursor, limit, columns)
+        if not posts and cursor is None:
+            raise HTTPException(status_code=404, detail="Користувач не має постів")
+        entry = await asyncio.to_thread(response_cache.store_posts, user_id, cursor, limit, posts, next_cursor,
+                                        generation)
+    return response_cache.respond(request, entry)
+
+
+@router.post("/posts/", response_model=schemas.PostResponse)
+async def create_post(
+        post_data: schemas.PostCreate,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity)
+):
+    """Створення поста (тільки для авторизованих)"""
+    return await crud_async.create_post(db, current_user, post_data)
+
+
+@router.delete("/posts/{post_id}/")
+async def delete_post(
+        post_id: int,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity)
+):
+    """Видалення поста (тільки для власника)"""
+    return await crud_async.delete_post(db, current_user, post_id)
+
+
+@router.put("/posts/{post_id}/", response_model=schemas.PostResponse)
+async def edit_post(
+        post_id: int,
+        post_update: schemas.PostUpdate,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    """Редагування поста (може редагувати лише власник)"""
+    return await crud_async.update_post(db, current_user, post_id, post_update)
+
+
+@router.post("/users/{user_id}/follow/")
+async def follow_user(
+        user_id: int,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    return await db.run_sync(feed.follow, current_user.id, user_id)
+
+
+@router.delete("/users/{user_id}/follow/")
+async def unfollow_user(
+        user_id: int,
+        db: AsyncSession = Depends(database.get_async_db),
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    return await db.run_sync(feed.unfollow, current_user.id, user_id)
+
+
+@router.get("/feed/", response_model=list[schemas.PostResponse])
+async def get_feed(
+        response: Response,
+        cursor: str = None,
+        limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+        db: AsyncSession = Depends(replicas.get_read_async_db),
+        primary: AsyncSession = Depends(database.get_async_db),  # Побудова кешованої стрічки
+        current_user: schemas.TokenData = Depends(auth.get_current_identity),
+):
+    """Стрічка через синхронний фасад сесії (злиття і кеш спільні з feed.get_feed)"""
+    posts, next_cursor = await db.run_sync(feed.get_feed, current_user.id, cursor, limit, primary.sync_session)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return posts
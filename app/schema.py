@@ -0,0 +1,30 @@
+"""Керування схемою БД через міграції Alembic (замість metadata.create_all)"""
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from . import database
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ALEMBIC_INI = os.path.join(ROOT_DIR, "alembic.ini")
+BASELINE_REVISION = "0001"  # Схема, яку раніше створював metadata.create_all
+
+
+def _config(connection) -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(ROOT_DIR, "migrations"))
+    config.attributes["connection"] = connection
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade(revision: str = "head"):
+    """Застосування міграцій; бази без alembic_version позначаються як baseline"""
+    with database.get_engine().begin() as connection:
+        config = _config(connection)
+        tables = inspect(connection).get_table_names()
+        if "users" in tables and "alembic_version" not in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
@@ -1,7 +1,9 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, model_validator
 from datetime import datetime
 from typing import Optional
 
+from . import hashing
+
 
 class UserCreate(BaseModel):
     email: EmailStr
@@ -32,7 +34,12 @@ class Token(BaseModel):
 
 
 class TokenData(BaseModel):
+    """Ідентичність з claims токена (без завантаження користувача з БД)"""
     email: Optional[str] = None
+    id: Optional[int] = None
+    token_version: int = 0
+    jti: Optional[str] = None
+    exp: Optional[int] = None
 
 
 class UserLogin(BaseModel):
@@ -60,3 +67,34 @@ class PostResponse(PostBase):
 
 class PostUpdate(BaseModel):
     text: str  # Оновлений текст поста
+
+
+class UserImport(BaseModel):
+    """Рядок масового імпорту користувачів: пароль відкритим текстом або готовий bcrypt-хеш"""
+    email: EmailStr
+    full_name: Optional[str] = None
+    password: Optional[str] = None
+    password_hash: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_password(self):
+        if not self.password and not self.password_hash:
+            raise ValueError("Потрібно вказати password або password_hash")
+        if self.password_hash:
+            # Невідомий чи пошкоджений хеш інакше падав би лише при вході (500 на /login/)
+            scheme = hashing.pwd_context.identify(self.password_hash)
+            if scheme is None:
+                raise ValueError("password_hash має непідтримуваний формат")
+            try:
+                hashing.pwd_context.handler(scheme).from_string(self.password_hash)
+            except ValueError as e:
+                raise ValueError(f"Некоректний password_hash: {e}")
+        return self
+
+
+class PostImport(BaseModel):
+    """Рядок масового імпорту постів"""
+    user_id: int
+    text: str = Field(max_length=1000)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
@@ -0,0 +1,224 @@
+import os
+import threading
+import time
+from collections import defaultdict
+
+from dotenv import load_dotenv
+from sqlalchemy import case, func
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import Session
+
+from . import models
+
+load_dotenv()
+
+NGRAM_SIZE = 3  # Довжина n-грами для внутрішнього індексу
+MAX_CANDIDATES = 10000  # Більше кандидатів — індекс неселективний, краще звичайний ILIKE
+MYSQL_MIN_TERM = 2  # ngram_token_size у MySQL за замовчуванням
+# Перечитування індексу (секунди; 0 — ніколи): індекс бачить лише зміни свого процесу, тож користувачі,
+# створені іншими воркерами, CLI чи напряму в БД, з'являються в ньому не пізніше ніж через SEARCH_INDEX_TTL
+SEARCH_INDEX_TTL = float(os.getenv("SEARCH_INDEX_TTL", 300))
+
+
+def _ngrams(value: str):
+    return {value[i:i + NGRAM_SIZE] for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+def _term_score(term: str, value: str) -> int:
+    """Оцінка збігу: повний збіг > префікс > підрядок"""
+    if value == term:
+        return 3
+    if value.startswith(term):
+        return 2
+    return 1
+
+
+class NgramIndex:
+    """Інвертований індекс n-грам по email та full_name (для SQLite і тестів)"""
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self.loaded_at = 0.0
+        self._lock = threading.RLock()
+        self._postings = {"email": defaultdict(set), "full_name": defaultdict(set)}
+        self._values = {}  # user_id -> {"email": ..., "full_name": ...}
+        self.loaded = False
+
+    def load(self, db: Session):
+        """Початкове заповнення індексу з таблиці users"""
+        with self._lock:
+            if self.loaded and not (self.ttl and time.monotonic() - self.loaded_at > self.ttl):
+                return
+            if self.loaded:
+                self.reset()
+            rows = db.query(models.User.id, models.User.email, models.User.full_name).yield_per(1000)
+            for user_id, email, full_name in rows:
+                self._add(user_id, email, full_name)
+            self.loaded = True
+            self.loaded_at = time.monotonic()
+
+    def reset(self):
+        """Скидання індексу; наступний пошук перечитає таблицю (після масового імпорту)"""
+        with self._lock:
+            for postings in self._postings.values():
+                postings.clear()
+            self._values.clear()
+            self.loaded = False
+
+    def add(self, user_id: int, email: str, full_name: str = None):
+        with self._lock:
+            if self.loaded:
+                self._remove(user_id)
+                self._add(user_id, email, full_name)
+
+    def remove(self, user_id: int):
+        with self._lock:
+            self._remove(user_id)
+
+    def _add(self, user_id, email, full_name):
+        values = {"email": (email or "").lower(), "full_name": (full_name or "").lower()}
+        self._values[user_id] = values
+        for field, value in values.items():
+            for gram in _ngrams(value):
+                self._postings[field][gram].add(user_id)
+
+    def _remove(self, user_id):
+        values = self._values.pop(user_id, None)
+        if values is None:
+            return
+        for field, value in values.items():
+            postings = self._postings[field]
+            for gram in _ngrams(value):
+                ids = postings.get(gram)
+                if ids is not None:
+                    ids.discard(user_id)
+                    if not ids:
+                        del postings[gram]
+
+    def search(self, email: str = None, full_name: str = None):
+        """Id користувачів за релевантністю; None, якщо всі терміни коротші за n-граму"""
+        terms = {f: t.lower() for f, t in (("email", email), ("full_name", full_name)) if t}
+        with self._lock:
+            candidates = None
+            for field, term in terms.items():
+                grams = _ngrams(term)
+                if not grams:
+                    continue  # Короткий термін перевіряється нижче по значеннях
+                postings = sorted((self._postings[field].get(g, set()) for g in grams), key=len)
+                found = set(postings[0]).intersection(*postings[1:])
+                candidates = found if candidates is None else candidates & found
+            if candidates is None:
+                return None
+
+            scored = []
+            for user_id in candidates:
+                values = self._values[user_id]
+                if all(term in values[field] for field, term in terms.items()):
+                    score = sum(_term_score(term, values[field]) for field, term in terms.items())
+                    length = sum(len(values[field]) for field in terms)
+                    scored.append((-score, length, user_id))
+        scored.sort()
+        return [user_id for _, _, user_id in scored]
+
+
+ngram_index = NgramIndex(SEARCH_INDEX_TTL)
+
+
+def _is_mysql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "mysql"
+
+
+def index_user(user: models.User):
+    """Оновлення індексу після створення або зміни користувача"""
+    ngram_index.add(user.id, user.email, user.full_name)
+
+
+def remove_user(user_id: int):
+    ngram_index.remove(user_id)
+
+
+def _ilike(query, email, full_name):
+    if email:
+        query = query.filter(models.User.email.ilike(f"%{email}%"))
+    if full_name:
+        query = query.filter(models.User.full_name.ilike(f"%{full_name}%"))
+    return query
+
+
+def filter_query(db: Session, query, email: str = None, full_name: str = None):
+    """Лише текстові фільтри (без ранжування) — для сторінок з іншим сортуванням"""
+    if _is_mysql(db):
+        for column, term in ((models.User.email, email), (models.User.full_name, full_name)):
+            if term and len(term) >= MYSQL_MIN_TERM:
+                query = query.filter(match(column, against='"' + term.replace('"', " ") + '"').in_boolean_mode())
+        return _ilike(query, email, full_name)
+
+    ngram_index.load(db)
+    ids = ngram_index.search(email, full_name)
+    if not ids or len(ids) > MAX_CANDIDATES:
+        return _ilike(query, email, full_name)  # Без збігів в індексі — перевірка в БД (індекс міг відстати)
+    return query.filter(models.User.id.in_(ids))
+
+
+def _load_page(query, ranked_ids, offset: int, limit: int = None):
+    """Повні рядки лише для id сторінки, у порядку ранжування"""
+    page = ranked_ids[offset:offset + limit if limit is not None else None]
+    if not page:
+        return []
+    order = {user_id: pos for pos, user_id in enumerate(page)}
+    users = query.filter(models.User.id.in_(page)).all()
+    return sorted(users, key=lambda u: order[u.id])
+
+
+def _matching_ids(query, ids):
+    """Id кандидатів з індексу, що проходять решту фільтрів запиту (вибираються лише id)"""
+    if not ids:
+        return []
+    matching = {user_id for (user_id,) in query.with_entities(models.User.id).filter(models.User.id.in_(ids))}
+    return [user_id for user_id in ids if user_id in matching]
+
+
+def _ranked_page(query, email, full_name, offset: int, limit: int = None):
+    """Сторінка збігів ILIKE за релевантністю: ранжування і LIMIT / OFFSET виконує БД
+    (повний збіг > префікс > підрядок, далі коротші значення, далі id — як у NgramIndex.search)"""
+    score, length = 0, 0
+    for column, term in ((models.User.email, email), (models.User.full_name, full_name)):
+        if not term:
+            continue
+        term = term.lower()
+        value = func.lower(func.coalesce(column, ""))
+        score = score + case((value == term, 3), (func.substr(value, 1, len(term)) == term, 2), else_=1)
+        length = length + func.char_length(value)
+    query = _ilike(query, email, full_name).order_by(score.desc(), length, models.User.id).offset(offset)
+    return (query.limit(limit) if limit is not None else query).all()
+
+
+def search_users(db: Session, query, email: str = None, full_name: str = None,
+                 offset: int = 0, limit: int = None):
+    """Застосовує текстові фільтри до запиту і повертає користувачів за релевантністю
+    (сторінку offset / limit — повні рядки завантажуються лише для неї).
+
+    MySQL: FULLTEXT (ngram) індекси + уточнення через ILIKE для точної семантики підрядка.
+    Інші СУБД: внутрішній n-грамний індекс; за неселективного запиту або без збігів в індексі — ILIKE.
+    """
+    if _is_mysql(db):
+        score = None
+        for column, term in ((models.User.email, email), (models.User.full_name, full_name)):
+            if not term or len(term) < MYSQL_MIN_TERM:
+                continue
+            phrase = '"' + term.replace('"', " ") + '"'
+            relevance = match(column, against=phrase).in_boolean_mode()
+            query = query.filter(relevance)
+            score = relevance if score is None else score + relevance
+        if score is None:
+            return _ranked_page(query, email, full_name, offset, limit)
+        query = _ilike(query, email, full_name).order_by(score.desc(), models.User.id).offset(offset)
+        return (query.limit(limit) if limit is not None else query).all()
+
+    ngram_index.load(db)
+    ids = ngram_index.search(email, full_name)
+    if ids and query.whereclause is None:
+        return _load_page(query, ids, offset, limit)  # Інших фільтрів немає: сторінка прямо з ранжування індексу
+    if not ids or len(ids) > MAX_CANDIDATES:  # Порожній результат перевіряється в БД: індекс міг відстати
+        return _ranked_page(query, email, full_name, offset, limit)
+    return _load_page(query, _matching_ids(query, ids), offset, limit)
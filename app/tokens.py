@@ -0,0 +1,259 @@
+"""Видача і швидка перевірка JWT без python-jose.
+
+Ключі (кільце за kid) розбираються один раз; HS256/384/512 перевіряються через hmac,
+EdDSA (Ed25519) і RS256 — через cryptography, тож інші сервіси можуть перевіряти токени
+відкритим ключем (GET /.well-known/jwks.json). Перевірені токени кешуються до закінчення
+строку дії, відкликані jti зберігаються у denylist, а версія токенів користувача
+(claim "ver") дозволяє відкликати всі його токени без звернення до БД.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+from . import cache, metrics
+
+load_dotenv()
+
+SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
+ALGORITHM = os.getenv("ALGORITHM", "HS256")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# JSON-список ключів [{"kid", "alg", "secret" | "private_key_file" | "public_key_file"}];
+# без нього використовується один ключ kid="default" з SECRET_KEY / ALGORITHM
+JWT_KEYS_FILE = os.getenv("JWT_KEYS_FILE")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")  # Яким ключем підписувати нові токени
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+
+DEFAULT_KID = "default"
+HMAC_DIGESTS = {"HS256": hashlib.sha256, "HS384": hashlib.sha384, "HS512": hashlib.sha512}
+_TOKEN_TTL = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Перевірені токени (лише в цьому процесі): token -> claims
+verified_cache = cache.make_cache("tokens", TOKEN_CACHE_SIZE, _TOKEN_TTL, local=True)
+# Відкликані jti (вихід) і поточні версії токенів користувачів; спільні, якщо CACHE_BACKEND=redis.
+# Без витіснення за розміром: витіснений запис знову зробив би відкликаний токен дійсним
+denylist = cache.make_cache("denylist", None, _TOKEN_TTL)
+token_versions = cache.make_cache("token_versions", None, _TOKEN_TTL)
+
+REVOKED_VERSION = -1  # Користувача видалено: недійсні всі його токени
+
+
+class TokenError(ValueError):
+    """Токен недійсний: підпис, формат, строк дії або відкликання"""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class Key:
+    """Ключ кільця: вміє підписувати (секрет / закритий ключ) та перевіряти підпис"""
+
+    def __init__(self, kid: str, alg: str, secret: str = None, private_key=None, public_key=None):
+        if alg not in HMAC_DIGESTS and alg not in ("EdDSA", "RS256"):
+            raise ValueError(f"Непідтримуваний алгоритм JWT: {alg}")
+        self.kid = kid
+        self.alg = alg
+        self.secret = secret.encode() if secret is not None else None
+        self.private_key = private_key
+        self.public_key = public_key or (private_key.public_key() if private_key is not None else None)
+
+    @property
+    def can_sign(self) -> bool:
+        return self.secret is not None or self.private_key is not None
+
+    def sign(self, data: bytes) -> bytes:
+        if self.alg in HMAC_DIGESTS:
+            return hmac.new(self.secret, data, HMAC_DIGESTS[self.alg]).digest()
+        if self.alg == "EdDSA":
+            return self.private_key.sign(data)
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.asymmetric import padding
+        return self.private_key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+
+    def verify(self, data: bytes, signature: bytes) -> bool:
+        if self.alg in HMAC_DIGESTS:
+            return hmac.compare_digest(hmac.new(self.secret, data, HMAC_DIGESTS[self.alg]).digest(), signature)
+        from cryptography.exceptions import InvalidSignature
+        try:
+            if self.alg == "EdDSA":
+                self.public_key.verify(signature, data)
+            else:
+                from cryptography.hazmat.primitives import hashes
+                from cryptography.hazmat.primitives.asymmetric import padding
+                self.public_key.verify(signature, data, padding.PKCS1v15(), hashes.SHA256())
+        except InvalidSignature:
+            return False
+        return True
+
+    def jwk(self):
+        """Відкритий ключ у форматі JWK (лише для асиметричних алгоритмів)"""
+        if self.alg == "EdDSA":
+            from cryptography.hazmat.primitives import serialization
+            raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            return {"kty": "OKP", "crv": "Ed25519", "x": _b64encode(raw), "kid": self.kid, "alg": "EdDSA",
+                    "use": "sig"}
+        if self.alg == "RS256":
+            numbers = self.public_key.public_numbers()
+            def to_bytes(value):
+                return value.to_bytes((value.bit_length() + 7) // 8, "big")
+            return {"kty": "RSA", "n": _b64encode(to_bytes(numbers.n)), "e": _b64encode(to_bytes(numbers.e)),
+                    "kid": self.kid, "alg": "RS256", "use": "sig"}
+        return None
+
+
+def _read_pem(path: str, base_dir: str) -> bytes:
+    with open(os.path.join(base_dir, path), "rb") as f:
+        return f.read()
+
+
+def _load_key(entry: dict, base_dir: str) -> Key:
+    private_key = public_key = None
+    if entry.get("private_key_file") or entry.get("public_key_file"):
+        from cryptography.hazmat.primitives import serialization
+        if entry.get("private_key_file"):
+            private_key = serialization.load_pem_private_key(_read_pem(entry["private_key_file"], base_dir), None)
+        if entry.get("public_key_file"):
+            public_key = serialization.load_pem_public_key(_read_pem(entry["public_key_file"], base_dir))
+    return Key(entry["kid"], entry["alg"], secret=entry.get("secret"), private_key=private_key,
+               public_key=public_key)
+
+
+class KeyRing:
+    """Ключі за kid; токени без kid (видані до появи кільця) перевіряються ключем "default" """
+
+    def __init__(self, keys, active_kid: str = None):
+        self.keys = {key.kid: key for key in keys}
+        self.active = self.keys[active_kid or keys[0].kid]
+        if not self.active.can_sign:
+            raise ValueError(f"Ключ {self.active.kid} не має секрету чи закритого ключа для підпису")
+
+    def get(self, kid: str = None) -> Key:
+        key = self.keys.get(kid or DEFAULT_KID)
+        if key is None and kid is None:
+            key = self.active
+        return key
+
+
+def load_key_ring() -> KeyRing:
+    if not JWT_KEYS_FILE:
+        return KeyRing([Key(DEFAULT_KID, ALGORITHM, secret=SECRET_KEY)])
+    with open(JWT_KEYS_FILE, encoding="utf-8") as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(JWT_KEYS_FILE))
+    return KeyRing([_load_key(entry, base_dir) for entry in entries], JWT_ACTIVE_KID)
+
+
+_key_ring = None
+_key_ring_lock = threading.Lock()
+
+
+def get_key_ring() -> KeyRing:
+    global _key_ring
+    if _key_ring is None:
+        with _key_ring_lock:
+            if _key_ring is None:
+                _key_ring = load_key_ring()
+    return _key_ring
+
+
+def reload_keys():
+    """Перечитати JWT_KEYS_FILE (ротація ключів без перезапуску)"""
+    global _key_ring
+    ring = load_key_ring()
+    with _key_ring_lock:
+        _key_ring = ring
+    verified_cache.clear()
+
+
+def issue(claims: dict, expires_seconds: float = None) -> str:
+    """Підписати токен активним ключем; додає exp, iat, jti і kid у заголовку"""
+    key = get_key_ring().active
+    now = int(time.time())
+    payload = {**claims, "iat": now, "exp": now + int(expires_seconds or _TOKEN_TTL), "jti": uuid.uuid4().hex}
+    with metrics.timer("jwt_encode"):
+        header = _b64encode(json.dumps({"alg": key.alg, "typ": "JWT", "kid": key.kid},
+                                       separators=(",", ":")).encode())
+        body = _b64encode(json.dumps(payload, separators=(",", ":"), default=str).encode())
+        signing_input = f"{header}.{body}"
+        return f"{signing_input}.{_b64encode(key.sign(signing_input.encode()))}"
+
+
+def _decode(token: str) -> dict:
+    try:
+        header_b64, body_b64, signature_b64 = token.split(".")
+        header = json.loads(_b64decode(header_b64))
+        key = get_key_ring().get(header.get("kid"))
+        # Алгоритм задає ключ, а не заголовок токена (захист від підміни alg)
+        if key is None or header.get("alg") != key.alg:
+            raise TokenError("Невідомий ключ або алгоритм")
+        if not key.verify(f"{header_b64}.{body_b64}".encode(), _b64decode(signature_b64)):
+            raise TokenError("Недійсний підпис")
+        claims = json.loads(_b64decode(body_b64))
+    except TokenError:
+        raise
+    except (ValueError, TypeError, AttributeError) as e:
+        raise TokenError(f"Некоректний токен: {e}")
+    if not isinstance(claims, dict):
+        raise TokenError("Некоректний токен")
+    return claims
+
+
+def _check_revocation(claims: dict):
+    if claims.get("jti") and denylist.get(claims["jti"]) is not None:
+        raise TokenError("Токен відкликано")
+    if claims.get("uid") is not None:
+        current = token_versions.get(str(claims["uid"]))
+        if current is not None and current != claims.get("ver", 0):
+            raise TokenError("Версія токена застаріла")
+
+
+def verify(token: str) -> dict:
+    """Claims перевіреного токена; TokenError, якщо токен недійсний, прострочений чи відкликаний"""
+    with metrics.timer("jwt_decode"):
+        claims = verified_cache.get(token)
+        if claims is None:
+            claims = _decode(token)
+            remaining = claims.get("exp", 0) - time.time()
+            if remaining <= 0:
+                raise TokenError("Строк дії токена минув")
+            verified_cache.set(token, claims, ttl=remaining)
+        elif claims["exp"] <= time.time():
+            raise TokenError("Строк дії токена минув")
+        _check_revocation(claims)
+    return claims
+
+
+def revoke(jti: str, exp: float):
+    """Відкликати один токен (вихід): jti потрапляє в denylist до закінчення строку дії"""
+    if jti:
+        denylist.set(jti, 1, ttl=max(1, (exp or 0) - time.time()))
+
+
+def set_token_version(user_id: int, version: int):
+    """Нова версія токенів користувача: усі токени зі старою "ver" стають недійсними"""
+    token_versions.set(str(user_id), version)
+
+
+def revoke_user(user_id: int):
+    """Користувача видалено: жоден його токен більше не приймається"""
+    token_versions.set(str(user_id), REVOKED_VERSION)
+
+
+def warmup():
+    """Завантаження кільця ключів і пробний підпис / перевірка (ключі cryptography, кеш коду)"""
+    _decode(issue({"sub": "warmup"}, expires_seconds=1))
+
+
+def jwks() -> dict:
+    return {"keys": [jwk for jwk in (key.jwk() for key in get_key_ring().keys.values()) if jwk]}
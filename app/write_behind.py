@@ -0,0 +1,130 @@
+"""Відкладений запис last_login / last_logout пакетами замість UPDATE на кожен вхід/вихід"""
+import logging
+import os
+import threading
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, update
+
+from . import database, models
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# WRITE_BEHIND=false — синхронний запис у запиті (сувора узгодженість)
+WRITE_BEHIND = os.getenv("WRITE_BEHIND", "true").lower() in ("1", "true", "yes")
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", 1.0))  # Секунди між скиданнями
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", 1000))  # Скидання за розміром буфера
+
+COLUMNS = ("last_login", "last_logout")
+
+
+class TimestampBuffer:
+    """Буфер часових міток користувачів: одна (остання) мітка на користувача і колонку"""
+
+    def __init__(self, interval: float, max_pending: int):
+        self.interval = interval
+        self.max_pending = max_pending
+        self._pending = {}  # user_id -> {column: datetime}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        self.stats = {"recorded": 0, "coalesced": 0, "flushes": 0, "rows_written": 0, "failures": 0}
+
+    def record(self, user_id: int, column: str, value):
+        with self._lock:
+            values = self._pending.setdefault(user_id, {})
+            if column in values:
+                self.stats["coalesced"] += 1
+            if values.get(column) is None or values[column] < value:
+                values[column] = value
+            self.stats["recorded"] += 1
+            full = len(self._pending) >= self.max_pending
+        self._ensure_started()
+        if full:
+            self._wake.set()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None and not self._stopping:
+                    self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def _merge_back(self, batch):
+        """Повернення незаписаних міток у буфер (новіші значення не перезаписуються)"""
+        with self._lock:
+            for user_id, values in batch.items():
+                current = self._pending.setdefault(user_id, {})
+                for column, value in values.items():
+                    if current.get(column) is None or current[column] < value:
+                        current[column] = value
+
+    def flush(self):
+        """Запис накопичених міток: executemany UPDATE на кожен набір колонок"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return
+
+            groups = {}
+            for user_id, values in batch.items():
+                columns = tuple(column for column in COLUMNS if column in values)
+                groups.setdefault(columns, []).append({"b_id": user_id, **values})
+
+            users = models.User.__table__
+            try:
+                with database.get_engine().begin() as connection:
+                    for columns, rows in groups.items():
+                        statement = (
+                            update(users)
+                            .where(users.c.id == bindparam("b_id"))
+                            .values({column: bindparam(column) for column in columns})
+                        )
+                        connection.execute(statement, rows)
+            except Exception:
+                self.stats["failures"] += 1
+                logger.exception("Не вдалося записати %d відкладених міток", len(batch))
+                self._merge_back(batch)
+                return
+            self.stats["flushes"] += 1
+            self.stats["rows_written"] += len(batch)
+
+    def stop(self):
+        """Зупинка потоку і фінальне скидання буфера (при завершенні роботи)"""
+        self._stopping = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        self.flush()
+        self._stopping = False
+
+    def reset_after_fork(self):
+        """Після fork потік скидання батьківського процесу не існує; буфер починається заново"""
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stopping = False
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+
+buffer = TimestampBuffer(WRITE_BEHIND_INTERVAL, WRITE_BEHIND_MAX_PENDING)
+
+
+def stats():
+    return {"enabled": WRITE_BEHIND, "pending": buffer.pending(), **buffer.stats}
@@ -0,0 +1,252 @@
+"""Навантажувальний тест API в одному процесі (ASGI-клієнт httpx, без мережі).
+
+Заповнює БД синтетичними даними (повторний запуск на тому ж файлі доповнює до потрібного обсягу),
+проганяє кожен ендпоінт app.main і друкує p50/p95/p99 та req/s; --output зберігає JSON-звіт.
+
+Запуск:
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.api_bench --users 10000 --posts 100000 --output before.json
+    python -m benchmarks.api_bench --users 1000000 --posts 10000000 --db sqlite:///./api_bench.db
+    python -m benchmarks.compare before.json after.json
+Для MySQL задайте --db mysql+pymysql://...; DB_MODE=async перевіряє асинхронні маршрути.
+Швидка серіалізація списків: FAST_JSON=true python -m benchmarks.api_bench --output fast.json
+і python -m benchmarks.compare before.json fast.json.
+"""
+import argparse
+import asyncio
+import os
+import random
+import string
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from . import report
+
+SEED_BATCH = 10000
+BENCH_PASSWORD = "benchmark-password"
+ADMIN_EMAIL = "admin@bench.example.com"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--posts", type=int, default=100_000)
+    parser.add_argument("--db", default="sqlite:///./api_bench.db")
+    parser.add_argument("--requests", type=int, default=500, help="Запитів на сценарій")
+    parser.add_argument("--bcrypt-requests", type=int, default=50, help="Запитів на register/login")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", nargs="*", help="Лише вказані сценарії")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Файл JSON-звіту (інакше stdout)")
+    return parser.parse_args()
+
+
+def random_word(rnd, size):
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(size))
+
+
+def seed(engine, models, users: int, posts: int, rnd, password_hash: str):
+    """Доповнення users і posts до заданих обсягів пакетними INSERT"""
+    from sqlalchemy import func, insert, select
+
+    user_table, post_table = models.User.__table__, models.Post.__table__
+    with engine.begin() as connection:
+        have_users = connection.scalar(select(func.count()).select_from(user_table))
+        have_posts = connection.scalar(select(func.count()).select_from(post_table))
+
+    for start in range(have_users, users, SEED_BATCH):
+        rows = [{"email": f"user{i}@bench.example.com", "password": password_hash,
+                 "full_name": f"{random_word(rnd, 6).title()} {random_word(rnd, 9).title()}"}
+                for i in range(start, min(start + SEED_BATCH, users))]
+        with engine.begin() as connection:
+            connection.execute(insert(user_table), rows)
+
+    # Пости розподілені між користувачами нерівномірно (частина авторів пише значно більше)
+    base = datetime(2024, 1, 1)
+    for start in range(have_posts, posts, SEED_BATCH):
+        rows = []
+        for i in range(start, min(start + SEED_BATCH, posts)):
+            user_id = int(rnd.paretovariate(1.2)) % users + 1
+            created_at = base + timedelta(seconds=i)
+            rows.append({"user_id": user_id, "text": f"post {i} {random_word(rnd, 40)}",
+                         "created_at": created_at, "updated_at": created_at})
+        with engine.begin() as connection:
+            connection.execute(insert(post_table), rows)
+
+    with engine.begin() as connection:
+        if connection.scalar(select(user_table.c.id).where(user_table.c.email == ADMIN_EMAIL)) is None:
+            connection.execute(insert(user_table), [{"email": ADMIN_EMAIL, "password": password_hash}])
+
+
+class Scenario:
+    """Один ендпоінт: метод, шлях і параметри i-го запиту"""
+
+    def __init__(self, name, method, path, requests, token=None, **options):
+        self.name = name
+        self.method = method
+        self.path = path  # str або fn(i) -> str
+        self.requests = requests
+        self.token = token  # None | fn(i) -> str
+        self.options = options  # fn(i) -> значення для json / data / params / headers
+
+    def request(self, i):
+        path = self.path(i) if callable(self.path) else self.path
+        kwargs = {key: fn(i) for key, fn in self.options.items()}
+        if self.token is not None:
+            kwargs.setdefault("headers", {})["Authorization"] = f"Bearer {self.token(i)}"
+        return self.method, path, kwargs
+
+
+def build_scenarios(args, auth, state, rnd):
+    run = uuid.uuid4().hex[:8]  # Унікальні email для кожного запуску на тій самій БД
+    user_ids = [rnd.randint(1, args.users) for _ in range(args.requests)]
+    users_email = [f"user{user_id - 1}@bench.example.com" for user_id in user_ids]
+    tokens = [auth.create_access_token({"sub": email, "uid": user_id, "ver": 0})
+              for user_id, email in zip(user_ids, users_email)]
+    new_emails = [f"new-{run}-{i}@bench.example.com" for i in range(args.bcrypt_requests)]
+    admin_token = auth.create_access_token({"sub": ADMIN_EMAIL})
+
+    def token(i):
+        return tokens[i % len(tokens)]
+
+    def author(i):
+        return state["authors"][i % len(state["authors"])]
+
+    def own_post(i):
+        return state["posts"][i % len(state["posts"])]
+
+    return [
+        Scenario("GET /healthz", "GET", "/healthz", args.requests),
+        Scenario("GET /readyz", "GET", "/readyz", args.requests),
+        Scenario("POST /register/", "POST", "/register/", args.bcrypt_requests,
+                 json=lambda i: {"email": new_emails[i], "password": BENCH_PASSWORD, "full_name": f"New {i}"}),
+        Scenario("POST /login/", "POST", "/login/", args.bcrypt_requests,
+                 data=lambda i: {"username": users_email[i % len(users_email)], "password": BENCH_PASSWORD}),
+        # Підбір пароля до одного акаунта: після LOGIN_ACCOUNT_LIMIT невдач — 429 без БД і bcrypt
+        Scenario("POST /login/ (bad password)", "POST", "/login/", args.requests,
+                 data=lambda i: {"username": users_email[0], "password": f"wrong-{i}"}),
+        Scenario("GET /users/", "GET", "/users/", args.requests, token),
+        Scenario("GET /users/ (cursor)", "GET", "/users/", args.requests, token,
+                 params=lambda i: {"cursor": state["users_cursor"], "limit": 100}),
+        Scenario("GET /users/search/ (id)", "GET", "/users/search/", args.requests, token,
+                 params=lambda i: {"user_id": user_ids[i % len(user_ids)]}),
+        Scenario("GET /users/search/ (email)", "GET", "/users/search/", args.requests, token,
+                 params=lambda i: {"email": users_email[i % len(users_email)]}),
+        Scenario("GET /users/filter/ (email)", "GET", "/users/filter/", args.requests, token,
+                 params=lambda i: {"email": users_email[i % len(users_email)][:9]}),
+        Scenario("GET /users/filter/ (full_name)", "GET", "/users/filter/", args.requests, token,
+                 params=lambda i: {"full_name": state["names"][i % len(state["names"])].split()[-1][2:6]}),
+        Scenario("GET /users/{id}/posts/", "GET", lambda i: f"/users/{author(i)}/posts/", args.requests),
+        Scenario("GET /users/{id}/posts/ (304)", "GET", lambda i: f"/users/{state['etag_user']}/posts/",
+                 args.requests, headers=lambda i: {"If-None-Match": state["etag"]}),
+        Scenario("POST /users/{id}/follow/", "POST", lambda i: f"/users/{author(i * 7 + 1)}/follow/",
+                 args.requests, token),
+        Scenario("GET /feed/", "GET", "/feed/", args.requests, token, params=lambda i: {"limit": 50}),
+        Scenario("POST /posts/", "POST", "/posts/", args.requests, token,
+                 json=lambda i: {"text": f"benchmark post {run} {i}"}),
+        Scenario("PUT /posts/{id}/", "PUT", lambda i: f"/posts/{own_post(i)[0]}/", args.requests,
+                 lambda i: own_post(i)[1], json=lambda i: {"text": f"edited {i}"}),
+        Scenario("DELETE /posts/{id}/", "DELETE", lambda i: f"/posts/{own_post(i)[0]}/", args.requests,
+                 lambda i: own_post(i)[1]),
+        Scenario("PUT /users/me/", "PUT", "/users/me/", args.requests, token,
+                 json=lambda i: {"full_name": f"Renamed {i}"}),
+        Scenario("GET /cache/stats/", "GET", "/cache/stats/", args.requests, token),
+        Scenario("GET /bulk/posts/export", "GET", "/bulk/posts/export", args.requests,
+                 lambda i: admin_token, params=lambda i: {"user_id": user_ids[i % len(user_ids)]}),
+        Scenario("GET /metrics", "GET", "/metrics", args.requests),
+        Scenario("DELETE /users/me/", "DELETE", "/users/me/", args.bcrypt_requests,
+                 lambda i: auth.create_access_token({"sub": new_emails[i]})),
+        # Останнім: вихід відкликає токени, якими користуються сценарії вище
+        Scenario("POST /logout/", "POST", "/logout/", args.requests, token),
+    ]
+
+
+async def run_scenario(client, scenario: Scenario, concurrency: int, state: dict):
+    samples, errors, statuses = [], 0, {}
+    queue = iter(range(scenario.requests))
+
+    async def worker():
+        nonlocal errors
+        for i in queue:
+            method, path, kwargs = scenario.request(i)
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            samples.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code >= 400:
+                errors += 1
+            elif scenario.name == "POST /posts/":
+                post = response.json()
+                state["posts"].append((post["id"], kwargs["headers"]["Authorization"].split()[1]))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result = report.summarize(samples, time.perf_counter() - start, errors)
+    result["statuses"] = {str(code): count for code, count in sorted(statuses.items())}
+    return result
+
+
+async def prepare(client, state, token, engine, models):
+    """Курсор другої сторінки користувачів і ETag сторінки постів для сценаріїв з умовами"""
+    from sqlalchemy import select
+
+    with engine.connect() as connection:
+        authors = connection.scalars(select(models.Post.user_id).distinct().limit(10000)).all()
+        state["names"] = connection.scalars(
+            select(models.User.full_name).where(models.User.full_name.is_not(None)).limit(1000)
+        ).all()
+    state["authors"] = random.Random(0).sample(authors, min(len(authors), 1000))
+    state["etag_user"] = state["authors"][0]
+    headers = {"Authorization": f"Bearer {token}"}
+    state["users_cursor"] = (await client.get("/users/", headers=headers)).headers.get("X-Next-Cursor")
+    response = await client.get(f"/users/{state['etag_user']}/posts/")
+    state["etag"] = response.headers.get("ETag", '""')
+
+
+async def run(args):
+    import httpx
+    from app import auth, database, hashing, main, models
+
+    rnd = random.Random(args.seed)
+    password_hash = hashing.pwd_context.hash(BENCH_PASSWORD)
+    started = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        seed(database.get_engine(), models, args.users, args.posts, rnd, password_hash)
+        seed_s = time.perf_counter() - started
+
+        state = {"posts": []}
+        scenarios = build_scenarios(args, auth, state, rnd)
+        if args.only:
+            scenarios = [scenario for scenario in scenarios if scenario.name in args.only]
+
+        results = {}
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            admin_token = auth.create_access_token({"sub": ADMIN_EMAIL})
+            await prepare(client, state, admin_token, database.get_engine(), models)
+            for scenario in scenarios:
+                if scenario.name.startswith(("PUT /posts", "DELETE /posts")) and not state["posts"]:
+                    continue  # Немає власних постів (сценарій POST /posts/ пропущено)
+                results[scenario.name] = await run_scenario(client, scenario, args.concurrency, state)
+    return results, seed_s
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", args.db)
+    os.environ.setdefault("ADMIN_EMAILS", ADMIN_EMAIL)
+    os.environ.setdefault("LOGIN_IP_LIMIT", "0")  # Усі запити йдуть з однієї адреси ASGI-клієнта
+
+    results, seed_s = asyncio.run(run(args))
+    report.print_table(results)
+    params = {"users": args.users, "posts": args.posts, "requests": args.requests,
+              "bcrypt_requests": args.bcrypt_requests, "concurrency": args.concurrency,
+              "db": os.environ["DATABASE_URL"].split("@")[-1], "db_mode": os.getenv("DB_MODE", "sync"),
+              "fast_json": os.getenv("FAST_JSON", "false"),
+              "seed_s": round(seed_s, 2)}
+    report.write_report("api", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Порівняння двох JSON-звітів бенчмарків (наприклад, до і після зміни).
+
+Запуск: python -m benchmarks.compare before.json after.json [--threshold 10]
+Код виходу 1, якщо p95 будь-якого сценарію погіршився більше ніж на threshold відсотків.
+"""
+import argparse
+import json
+
+
+def load(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Допустиме погіршення p95, %%")
+    args = parser.parse_args()
+
+    before, after = load(args.before), load(args.after)
+    print(f"{before['commit']} -> {after['commit']} ({after['kind']})")
+    print(f"{'name':32} {'p95 before':>11} {'p95 after':>11} {'Δ p95':>8} {'Δ per s':>8}")
+    regressed = []
+    for name, new in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            print(f"{name:32} {'-':>11} {new['p95_ms']:>11}")
+            continue
+        p95 = change(old["p95_ms"], new["p95_ms"])
+        rate = change(old["per_second"], new["per_second"])
+        print(f"{name:32} {old['p95_ms']:>11} {new['p95_ms']:>11} {p95:>+7.1f}% {rate:>+7.1f}%")
+        if p95 > args.threshold:
+            regressed.append(name)
+    if regressed:
+        print("Погіршення p95:", ", ".join(regressed))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Мікробенчмарки гарячих функцій: JWT, перевірка пароля, серіалізація відповідей.
+
+Запуск: python -m benchmarks.micro_bench [--iterations 5000] [--output micro.json]
+Кожна операція вимірюється окремо (p50/p95/p99 на виклик і викликів за секунду).
+Сторінки порівнюються у двох варіантах: Pydantic з ORM-об'єктів і fastjson з рядків-кортежів (FAST_JSON).
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+from . import report
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--bcrypt-iterations", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=100, help="Постів у серіалізованій сторінці")
+    parser.add_argument("--output", help="Файл JSON-звіту (інакше stdout)")
+    return parser.parse_args()
+
+
+def measure(fn, iterations: int, warmup: int = 10) -> dict:
+    for _ in range(min(warmup, iterations)):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return report.summarize(samples, time.perf_counter() - started)
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("HASH_POOL", "inline")  # Чистий час bcrypt без накладних витрат пулу
+    from app import auth, fastjson, hashing, models, schemas
+
+    token = auth.create_access_token({"sub": "bench@example.com"})
+    password_hash = hashing.pwd_context.hash("benchmark-password")
+    now = datetime(2024, 1, 1)
+    user = models.User(id=1, email="bench@example.com", full_name="Bench User", password=password_hash,
+                       last_login=now, last_logout=now)
+    posts = [models.Post(id=i, user_id=1, text=f"post {i} " + "x" * 200,
+                         created_at=now + timedelta(seconds=i), updated_at=now + timedelta(seconds=i))
+             for i in range(args.page_size)]
+
+    users = [models.User(id=i, email=f"user{i}@example.com", full_name=f"User {i}", last_login=now,
+                         last_logout=None) for i in range(args.page_size)]
+    post_rows = [tuple(getattr(post, field) for field in fastjson.POST_FIELDS) for post in posts]
+    user_rows = [tuple(getattr(user, field) for field in fastjson.USER_FIELDS) for user in users]
+
+    def serialize_posts():
+        return [schemas.PostResponse.model_validate(post).model_dump(mode="json") for post in posts]
+
+    def serialize_users():
+        return [schemas.UserResponse.model_validate(user).model_dump(mode="json") for user in users]
+
+    cases = {
+        "auth.create_access_token": (lambda: auth.create_access_token({"sub": "bench@example.com"}),
+                                     args.iterations),
+        "auth.decode_access_token": (lambda: auth.decode_access_token(token), args.iterations),
+        "auth.verify_password": (lambda: auth.verify_password("benchmark-password", password_hash),
+                                 args.bcrypt_iterations),
+        "UserResponse": (lambda: schemas.UserResponse.model_validate(user).model_dump_json(), args.iterations),
+        "PostResponse": (lambda: schemas.PostResponse.model_validate(posts[0]).model_dump_json(),
+                         args.iterations),
+        f"PostResponse page ({args.page_size})": (serialize_posts, max(1, args.iterations // args.page_size)),
+        f"fastjson posts page ({args.page_size})": (lambda: fastjson.dump_rows(post_rows, fastjson.POST_FIELDS),
+                                                    max(1, args.iterations // args.page_size)),
+        f"UserResponse page ({args.page_size})": (serialize_users, max(1, args.iterations // args.page_size)),
+        f"fastjson users page ({args.page_size})": (lambda: fastjson.dump_rows(user_rows, fastjson.USER_FIELDS),
+                                                    max(1, args.iterations // args.page_size)),
+    }
+
+    results = {name: measure(fn, iterations) for name, (fn, iterations) in cases.items()}
+    hashing.shutdown()
+    report.print_table(results)
+    params = {"iterations": args.iterations, "bcrypt_iterations": args.bcrypt_iterations,
+              "bcrypt_rounds": hashing.BCRYPT_ROUNDS, "hash_pool": hashing.HASH_POOL, "page_size": args.page_size,
+              "json_encoder": "orjson" if fastjson.orjson is not None else "pydantic_core"}
+    report.write_report("micro", params, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
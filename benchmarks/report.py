@@ -0,0 +1,65 @@
+"""Спільне для бенчмарків: перцентилі, метадані запуску і JSON-звіт"""
+import json
+import math
+import platform
+import subprocess
+import sys
+from datetime import datetime
+
+
+def percentile(samples, fraction: float) -> float:
+    """Перцентиль за найближчим рангом (samples мають бути відсортовані)"""
+    if not samples:
+        return 0.0
+    index = min(len(samples) - 1, max(0, math.ceil(fraction * len(samples)) - 1))
+    return samples[index]
+
+
+def summarize(samples_s, wall_s: float = None, errors: int = 0) -> dict:
+    """p50/p95/p99 у мілісекундах і пропускна здатність (операцій за секунду)"""
+    samples = sorted(value * 1000 for value in samples_s)
+    wall_s = wall_s if wall_s is not None else sum(samples_s)
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 0.50), 4),
+        "p95_ms": round(percentile(samples, 0.95), 4),
+        "p99_ms": round(percentile(samples, 0.99), 4),
+        "max_ms": round(samples[-1], 4) if samples else 0.0,
+        "per_second": round(len(samples) / wall_s, 1) if wall_s else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_report(kind: str, params: dict, results: dict, output: str = None) -> dict:
+    """Звіт у форматі, що порівнюється між комітами (benchmarks.compare)"""
+    report = {
+        "kind": kind,
+        "commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+def print_table(results: dict):
+    print(f"{'name':32} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'per s':>10} {'errors':>7}", file=sys.stderr)
+    for name, row in results.items():
+        print(f"{name:32} {row['p50_ms']:>10} {row['p95_ms']:>10} {row['p99_ms']:>10} {row['per_second']:>10} "
+              f"{row['errors']:>7}", file=sys.stderr)
@@ -0,0 +1,107 @@
+"""Порівняння пошуку користувачів: ILIKE '%...%' проти n-грамного індексу.
+
+Запуск (SQLite, 1M користувачів за замовчуванням):
+    python -m benchmarks.search_bench --users 1000000
+Для MySQL задайте DATABASE_URL — тоді порівнюється ILIKE з FULLTEXT (ngram).
+"""
+import argparse
+import os
+import random
+import statistics
+import string
+import time
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--db", default="sqlite:///./search_bench.db")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+def random_word(rnd, size):
+    return "".join(rnd.choice(string.ascii_lowercase) for _ in range(size))
+
+
+def seed_users(db, models, count, rnd):
+    """Заповнення таблиці users синтетичними даними (якщо вона ще порожня)"""
+    existing = db.query(models.User).count()
+    batch = []
+    for i in range(existing, count):
+        batch.append({
+            "email": f"{random_word(rnd, 8)}.{i}@{random_word(rnd, 5)}.com",
+            "password": "x",
+            "full_name": f"{random_word(rnd, 6).title()} {random_word(rnd, 9).title()}",
+        })
+        if len(batch) == 10000:
+            db.execute(models.User.__table__.insert(), batch)
+            db.commit()
+            batch.clear()
+    if batch:
+        db.execute(models.User.__table__.insert(), batch)
+        db.commit()
+
+
+def timed(fn, terms):
+    samples = []
+    for term in terms:
+        start = time.perf_counter()
+        fn(term)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "max_ms": round(samples[-1], 3),
+    }
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault("DATABASE_URL", args.db)
+    from app import database, models, schema, search
+
+    schema.upgrade()
+    rnd = random.Random(args.seed)
+    db = database.open_session()
+    try:
+        seed_users(db, models, args.users, rnd)
+
+        sample = db.query(models.User.email, models.User.full_name).limit(args.queries * 10).all()
+        picks = rnd.sample(sample, min(args.queries, len(sample)))
+        email_terms = [email[2:8] for email, _ in picks]
+        name_terms = [full_name.split()[1][1:6] for _, full_name in picks]
+
+        def ilike_email(term):
+            return search._ilike(db.query(models.User), term, None).all()
+
+        def index_email(term):
+            return search.search_users(db, db.query(models.User), email=term)
+
+        def ilike_name(term):
+            return search._ilike(db.query(models.User), None, term).all()
+
+        def index_name(term):
+            return search.search_users(db, db.query(models.User), full_name=term)
+
+        start = time.perf_counter()
+        if not search._is_mysql(db):
+            search.ngram_index.load(db)
+        build_s = time.perf_counter() - start
+
+        print(f"users={args.users} index_build_s={build_s:.2f}")
+        for name, fn, terms in (
+                ("email ILIKE", ilike_email, email_terms),
+                ("email index", index_email, email_terms),
+                ("full_name ILIKE", ilike_name, name_terms),
+                ("full_name index", index_name, name_terms),
+        ):
+            print(f"{name:16} {timed(fn, terms)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Продакшн-профіль сервера: gunicorn з uvicorn-воркерами (кілька процесів на контейнер).
+
+    python -m app.cli migrate                   # одноразово перед стартом (схема БД)
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Воркерів — WEB_CONCURRENCY (за замовчуванням кількість ядер); з кількома воркерами
+потрібен CACHE_BACKEND=redis, інакше сервер не стартує.
+
+Метрики: кожен воркер пише свої лічильники в METRICS_MULTIPROC_DIR, тож /metrics
+(хоч і обслуговується одним воркером) віддає суму по всіх процесах.
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn_worker.UvicornWorker"
+# Код застосунку імпортується один раз у майстрі і ділиться між воркерами (copy-on-write);
+# з'єднання, пули і потоки все одно створюються вже у воркері (див. post_fork)
+preload_app = os.getenv("PRELOAD_APP", "true").lower() in ("1", "true", "yes")
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.getenv("KEEPALIVE", 5))
+# Періодичний перезапуск воркерів (0 — вимкнено); jitter, щоб вони не перезапускались одночасно
+max_requests = int(os.getenv("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+
+# Ядра діляться між воркерами: кожен отримує свою частку процесів bcrypt
+os.environ.setdefault("HASH_WORKERS", str(max(1, multiprocessing.cpu_count() // workers)))
+# Схему оновлює окремий крок (app.cli migrate), а не кожен воркер: примусово, навіть якщо
+# MIGRATE_ON_STARTUP задано в .env чи оточенні, інакше воркери запускали б alembic одночасно
+os.environ["MIGRATE_ON_STARTUP"] = "false"
+# Лічильники в пам'яті процесу: без спільного каталогу /metrics показував би лише один воркер
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "app-metrics"))
+
+
+def on_starting(server):
+    from app import lifecycle, metrics
+    metrics.clear_multiprocess_dir()
+    try:
+        lifecycle.check_shared_state(server.cfg.workers)
+    except RuntimeError as e:
+        server.log.error(str(e))
+        sys.exit(1)
+
+
+def post_fork(server, worker):
+    from app import lifecycle
+    lifecycle.after_fork()
+
+
+def child_exit(server, worker):
+    from app import metrics
+    metrics.mark_process_dead(worker.pid)
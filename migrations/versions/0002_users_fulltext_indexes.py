@@ -0,0 +1,33 @@
+"""FULLTEXT (ngram) індекси users.email / users.full_name для пошуку (лише MySQL)
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = {"ix_users_email_ft": "email", "ix_users_full_name_ft": "full_name"}
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != "mysql":
+        return
+    # Бази, створені через create_all, можуть вже мати ці індекси
+    existing = {index["name"] for index in sa.inspect(bind).get_indexes("users")}
+    for name, column in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, "users", [column], mysql_prefix="FULLTEXT", mysql_with_parser="ngram")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != "mysql":
+        return
+    for name in INDEXES:
+        op.drop_index(name, table_name="users")
@@ -0,0 +1,20 @@
+"""Складений індекс posts (user_id, created_at, id) для стрічки постів користувача
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_posts_user_id_created_at_id", "posts", ["user_id", "created_at", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_posts_user_id_created_at_id", table_name="posts")
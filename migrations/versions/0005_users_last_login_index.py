@@ -0,0 +1,20 @@
+"""Індекс users (last_login, id): фільтр "активні з" і сортування за last_login
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_users_last_login_id", "users", ["last_login", "id"])
+
+
+def downgrade():
+    op.drop_index("ix_users_last_login_id", table_name="users")
@@ -0,0 +1,31 @@
+"""Таблиця follows: підписки користувачів для стрічки /feed/
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "follows",
+        sa.Column("follower_id", sa.Integer(), nullable=False),
+        sa.Column("followee_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["follower_id"], ["users.id"]),
+        sa.ForeignKeyConstraint(["followee_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("follower_id", "followee_id"),
+    )
+    op.create_index("ix_follows_followee_id", "follows", ["followee_id"])
+
+
+def downgrade():
+    op.drop_index("ix_follows_followee_id", table_name="follows")
+    op.drop_table("follows")
@@ -0,0 +1,53 @@
+"""Стрічка постів користувача має йти по індексу ix_posts_user_id_created_at_id
+без окремого сортування (EXPLAIN QUERY PLAN у SQLite, EXPLAIN у MySQL).
+
+Запуск: python -m pytest tests/  (DATABASE_URL — для MySQL, інакше тимчасова SQLite-база)
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+INDEX_NAME = "ix_posts_user_id_created_at_id"
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    # database читає DATABASE_URL під час імпорту, тому app імпортується лише тут
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tmp_path_factory.mktemp('explain') / 'explain_posts.db'}")
+    from app import database, models, schema
+
+    schema.upgrade()
+    session = database.open_session()
+    if not session.query(models.Post).first():
+        user = models.User(email="explain@example.com", password="x")
+        session.add(user)
+        session.flush()
+        start = datetime(2024, 1, 1)
+        session.add_all(models.Post(text=f"post {i}", user_id=user.id, created_at=start + timedelta(minutes=i))
+                        for i in range(200))
+        session.commit()
+    session.execute(text("ANALYZE" if session.get_bind().dialect.name == "sqlite" else "ANALYZE TABLE posts"))
+    yield session
+    session.close()
+
+
+def plan_lines(db, query):
+    sql = str(query.statement.compile(db.get_bind(), compile_kwargs={"literal_binds": True}))
+    if db.get_bind().dialect.name == "sqlite":
+        rows = db.execute(text("EXPLAIN QUERY PLAN " + sql)).all()
+        return [row[-1] for row in rows]
+    rows = db.execute(text("EXPLAIN " + sql)).mappings().all()
+    return [f"table={row['table']} key={row['key']} extra={row['Extra']}" for row in rows]
+
+
+@pytest.mark.parametrize("cursor", [None, (datetime(2024, 1, 1, 2), 100)], ids=["first page", "next page"])
+def test_posts_by_user_uses_index(db, cursor):
+    from app import crud, pagination
+
+    query = crud._posts_by_user_query(db, 1, pagination.encode_cursor(*cursor) if cursor else None)
+    lines = plan_lines(db, query.limit(101))
+
+    assert any(INDEX_NAME in line for line in lines), lines
+    assert not any("TEMP B-TREE" in line or "filesort" in line for line in lines), lines